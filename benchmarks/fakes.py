@@ -0,0 +1,112 @@
+"""
+Local stand-ins for the discord.py objects the modules use
+(Interaction, bot/client, channels, users). Nothing goes over the network;
+sends are counted and can be given an artificial latency.
+"""
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+class FakeChannel:
+    def __init__(self, channel_id, latency=0.0):
+        self.id = channel_id
+        self.latency = latency
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+
+class FakeUser:
+    def __init__(self, user_id, dm_channel=None):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.roles = []
+        self.guild_permissions = SimpleNamespace(administrator=True)
+        self.dm_channel = dm_channel
+
+    def __str__(self):
+        return self.name
+
+class FakeResponse:
+    def __init__(self):
+        self._done = False
+        self.messages = []
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.messages.append((content, kwargs))
+
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self.messages.append((None, kwargs))
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append((content, kwargs))
+
+class FakeInteraction:
+    """
+    Minimal discord.Interaction: what the command handlers read and call.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, guild_id, user=None, channel_id=None, client=None):
+        self.id = next(self._ids)
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.user = user or FakeUser(0)
+        self.client = client
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+        self.extras = {}
+
+class FakeBot:
+    """
+    Minimal bot/client: channel and user caches, DM creation.
+
+    Args:
+        cached_user_ids: Users present in the client cache (others need create_dm).
+        latency: Artificial latency of every send, in seconds.
+    """
+
+    def __init__(self, cached_user_ids=(), latency=0.0):
+        self.latency = latency
+        self.channels = {}
+        self.users = {uid: FakeUser(uid, FakeChannel(uid, latency)) for uid in cached_user_ids}
+        self.dm_created = 0
+        self.guilds = []
+        # Unsharded, like a plain commands.Bot
+        self.shard_count = None
+        self.shard_id = None
+
+    def get_channel(self, channel_id):
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(channel_id, self.latency)
+        return self.channels[channel_id]
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    async def fetch_user(self, user_id):
+        return self.users.get(user_id) or FakeUser(user_id)
+
+    async def create_dm(self, user):
+        self.dm_created += 1
+        return FakeChannel(user.id, self.latency)
+
+    @property
+    def messages_sent(self):
+        return sum(c.sent for c in self.channels.values()) + sum(
+            u.dm_channel.sent for u in self.users.values() if u.dm_channel)
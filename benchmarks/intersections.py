@@ -0,0 +1,104 @@
+"""
+Checks the bitset AND (planning.slot_mask / mask_to_schedule), the engine
+behind calculate_common_availability, against the previous pairwise
+implementation on random inputs, then times both for teams of 5, 50 and
+500 members.
+
+Usage:
+    python -m benchmarks.intersections [--cases 2000] [--repeat 20]
+"""
+import argparse
+import random
+import time
+
+from modules.planning import WEEK_MASK, mask_to_schedule, merge_intervals, slot_mask
+
+# The old fold duplicates fragments when a member's slots overlap;
+# past this many fragments it is reported as "blown up" instead of timed.
+FRAGMENT_LIMIT = 100000
+
+class FragmentLimit(Exception):
+    pass
+
+def pairwise_intersection(slot_lists):
+    """
+    Previous implementation: nested-loop intersection folded member by member.
+    """
+    current = slot_lists[0]
+    for slots in slot_lists[1:]:
+        intersections = []
+        for start_a, end_a in current:
+            for start_b, end_b in slots:
+                low = max(start_a, start_b)
+                high = min(end_a, end_b)
+                if low < high:
+                    intersections.append((low, high))
+            if len(intersections) > FRAGMENT_LIMIT:
+                raise FragmentLimit()
+        current = intersections
+        if not current:
+            break
+    return current
+
+def bitset_intersection(slot_lists):
+    """
+    Single-day bitset AND, decoded back to (start, end) runs.
+    """
+    common = WEEK_MASK
+    for slots in slot_lists:
+        mask = 0
+        for start, end in slots:
+            mask |= slot_mask(0, start, end)
+        common &= mask
+    return mask_to_schedule(common)[0]
+
+def random_slots(max_slots=3):
+    slots = []
+    for _ in range(random.randint(1, max_slots)):
+        start = random.randint(0, 22)
+        slots.append((start, random.randint(start + 1, 23)))
+    return slots
+
+def team_slots(members):
+    """
+    Realistic team: everyone is free around 19h-21h, plus a few other
+    (possibly overlapping) slots, so the intersection never becomes empty.
+    """
+    return [random_slots(max_slots=3) + [(random.randint(16, 19), random.randint(21, 23))] for _ in range(members)]
+
+def check_equivalence(cases):
+    """
+    Same covered hours as the old fold, and the output is canonical.
+    """
+    for _ in range(cases):
+        slot_lists = [random_slots() for _ in range(random.randint(1, 8))]
+        expected = merge_intervals(pairwise_intersection(slot_lists))
+        result = bitset_intersection(slot_lists)
+        assert result == expected, (slot_lists, result, expected)
+        assert result == merge_intervals(result), result
+    print(f"equivalence: {cases} random cases OK")
+
+def timed(func, slot_lists, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(slot_lists)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    check_equivalence(args.cases)
+    for members in (5, 50, 500):
+        slot_lists = team_slots(members)
+        try:
+            old = f"{timed(pairwise_intersection, slot_lists, args.repeat):9.1f} us"
+        except FragmentLimit:
+            old = f"> {FRAGMENT_LIMIT} fragments"
+        bits = timed(bitset_intersection, slot_lists, args.repeat)
+        print(f"{members:>4} members: pairwise {old} | bitset {bits:9.1f} us")
+
+if __name__ == "__main__":
+    main()
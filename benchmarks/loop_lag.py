@@ -0,0 +1,104 @@
+"""
+Measures event-loop lag while many team availability commands run concurrently,
+once with direct (blocking) sqlite calls and once through modules.database.run_read.
+
+Usage:
+    python -m benchmarks.loop_lag [--players 20000] [--commands 200]
+
+Set DATABASE_READERS to compare reader pool sizes.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+TICK = 0.005
+
+def _fill(players, teams, conn):
+    """
+    Inserts one guild, `teams` teams and full-week availability (runs on the writer thread).
+    """
+    from modules.planning import team_key
+
+    conn.executemany(
+        "INSERT INTO players (discord_id, guild_id, username, game, team, team_key) VALUES (?, 1, ?, 'League of Legends', ?, ?)",
+        ((pid, f"player{pid}", f"team{pid % teams}", team_key(f"team{pid % teams}")) for pid in range(players)),
+    )
+    rows = []
+    for pid in range(players):
+        for day in range(7):
+            start = random.randint(0, 20)
+            rows.append((pid, day, start, random.randint(start + 1, 23)))
+    conn.executemany("INSERT INTO availability (discord_id, day, start_time, end_time) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+
+def build_database(players, teams):
+    """
+    Creates the real schema (base tables + migrations) through modules.database,
+    then fills it. DATABASE_PATH must be set before.
+    """
+    from modules.database import init_database, run_write_blocking
+
+    asyncio.run(init_database())
+    run_write_blocking(_fill, players, teams)
+
+async def monitor(samples, stop):
+    """
+    Records how late each TICK sleep wakes up.
+    """
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        before = loop.time()
+        await asyncio.sleep(TICK)
+        samples.append((loop.time() - before - TICK) * 1000)
+
+async def run_load(mode, commands, teams):
+    from modules.database import conn, run_read
+    from modules.planning import calculate_common_availability
+
+    async def command(i):
+        team = f"team{i % teams}"
+        if mode == "blocking":
+            calculate_common_availability(team, 1, conn)
+        else:
+            await run_read(calculate_common_availability, team, 1)
+        await asyncio.sleep(0)
+
+    samples, stop = [], asyncio.Event()
+    watcher = asyncio.create_task(monitor(samples, stop))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(command(i) for i in range(commands)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    return samples, elapsed
+
+def report(mode, samples, elapsed, commands):
+    samples = sorted(samples) or [0.0]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{mode:>9}: {commands / elapsed:8.1f} cmd/s | loop lag "
+          f"median {statistics.median(samples):7.2f} ms, p99 {p99:7.2f} ms, max {samples[-1]:7.2f} ms "
+          f"({len(samples)} ticks)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=20000)
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--commands", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="zeri-bench-")
+    # Must be set before modules.database opens its connection
+    os.environ["DATABASE_PATH"] = os.path.join(directory, "database.db")
+    build_database(args.players, args.teams)
+
+    for mode in ("blocking", "run_read"):
+        samples, elapsed = asyncio.run(run_load(mode, args.commands, args.teams))
+        report(mode, samples, elapsed, args.commands)
+
+if __name__ == "__main__":
+    main()
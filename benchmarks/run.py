@@ -0,0 +1,218 @@
+"""
+Offline benchmark suite: builds a synthetic database, drives the real module
+functions against local stand-ins for Discord (benchmarks/fakes.py) and writes
+throughput, latency percentiles and peak RSS to a JSON file.
+
+Usage:
+    python -m benchmarks.run --guilds 200 --teams 5 --players 6 --output bench.json
+    python -m benchmarks.run ... --compare previous.json
+
+Scenarios:
+    common_availability_cold  get_common_availability with an empty cache
+    common_availability_warm  get_common_availability served from the cache
+    list_sessions             /liste_sessions handler
+    weekly_schedule           post_weekly_schedules over every guild
+    availability_reminder     send_availability_reminders to every player without availability
+    week_availability         /ajout_dispo_semaine handler (7 days, 2 slots each) until its write is committed
+
+By default the Discord rate limits of the background tasks are lifted so the
+bot's own overhead is measured; use --real-rate-limits to keep them.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def summarize(latencies, seconds, items):
+    return {
+        "count": items,
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(items / seconds, 1) if seconds > 0 else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+async def measure_calls(make_call, count, concurrency):
+    """
+    Runs `count` calls of make_call(i) with bounded concurrency, timing each one.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await make_call(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return summarize(latencies, time.perf_counter() - started, count)
+
+async def measure_once(coro_factory, items):
+    started = time.perf_counter()
+    await coro_factory()
+    seconds = time.perf_counter() - started
+    return summarize([seconds], seconds, items)
+
+async def run_suite(args):
+    # Imported here: DATABASE_PATH must be set before modules.database connects
+    from modules import tasks
+    from modules.config import load_guild_configs
+    from modules.database import init_database, run_read, run_write, close_database
+    from modules.planning import common_availability_cache, get_common_availability
+    from modules.session_management import list_sessions
+    from modules.player_management import add_week_availability
+    from modules.write_behind import write_queue
+    from benchmarks.fakes import FakeBot, FakeInteraction, FakeUser
+    from benchmarks.synthetic import generate
+
+    await init_database()
+    dataset = await run_write(generate, args.guilds, args.teams, args.players, args.slots,
+                              args.sessions, args.missing, args.seed)
+    await load_guild_configs()
+    teams = dataset.pop("team_list")
+    print("Dataset: " + ", ".join(f"{k}={v}" for k, v in dataset.items()))
+
+    if not args.real_rate_limits:
+        tasks.REMINDER_RATE_PER_SECOND = tasks.SCHEDULE_POST_RATE_PER_SECOND = 10 ** 9
+
+    rng = random.Random(args.seed)
+    sample = [rng.choice(teams) for _ in range(args.samples)]
+    latency = args.send_latency_ms / 1000
+    results = {}
+
+    async def cold(i):
+        common_availability_cache.clear()
+        await run_read(get_common_availability, sample[i][1], sample[i][0])
+    results["common_availability_cold"] = await measure_calls(cold, len(sample), args.concurrency)
+
+    async def warm(i):
+        await run_read(get_common_availability, sample[i][1], sample[i][0])
+    results["common_availability_warm"] = await measure_calls(warm, len(sample), args.concurrency)
+
+    async def sessions(i):
+        await list_sessions(FakeInteraction(sample[i][0]), sample[i][1])
+    results["list_sessions"] = await measure_calls(sessions, len(sample), args.concurrency)
+
+    bot = FakeBot(latency=latency)
+    results["weekly_schedule"] = await measure_once(lambda: tasks.post_weekly_schedules(bot), dataset["teams"])
+    results["weekly_schedule"]["messages_sent"] = bot.messages_sent
+
+    # Half of the users are in the client cache, the others need a DM channel
+    bot = FakeBot(cached_user_ids=range(10 ** 17, 10 ** 17 + dataset["players"], 2), latency=latency)
+    missing = await run_read(tasks._fetch_players_without_availability)
+    results["availability_reminder"] = await measure_once(lambda: tasks.send_availability_reminders(bot), len(missing))
+    results["availability_reminder"]["messages_sent"] = bot.messages_sent
+    results["availability_reminder"]["dm_channels_created"] = bot.dm_created
+
+    # Last: it fills availability, which changes the reminder recipients
+    registered = await run_read(
+        lambda limit, conn: conn.execute("SELECT discord_id, guild_id FROM players LIMIT ?", (limit,)).fetchall(),
+        args.samples)
+    week = {day: [(10, 12), (18, 22)] for day in range(7)}
+
+    async def week_availability(i):
+        discord_id, guild_id = registered[i]
+        await add_week_availability(FakeInteraction(guild_id), FakeUser(discord_id), week)
+        # The handler only queues the write: measure until it is committed
+        await write_queue.flushed(discord_id)
+    results["week_availability"] = await measure_calls(week_availability, len(registered), args.concurrency)
+
+    write_queue.flush_blocking()
+    close_database()
+    return dataset, results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous_path, results):
+    with open(previous_path) as f:
+        previous = json.load(f)["scenarios"]
+    print(f"\nCompared with {previous_path} (ratio > 1 = slower):")
+    for name, current in results.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        parts = []
+        for metric in ("p50_ms", "p99_ms", "seconds"):
+            if before.get(metric):
+                parts.append(f"{metric} x{current[metric] / before[metric]:.2f}")
+        print(f"  {name:<26} " + ", ".join(parts))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--teams", type=int, default=5, help="teams per guild")
+    parser.add_argument("--players", type=int, default=6, help="players per team")
+    parser.add_argument("--slots", type=int, default=2, help="availability slots per player and day")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions per team")
+    parser.add_argument("--missing", type=float, default=0.2, help="share of players without availability")
+    parser.add_argument("--samples", type=int, default=1000, help="calls per latency scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent calls per latency scenario")
+    parser.add_argument("--send-latency-ms", type=float, default=0.0, help="simulated Discord API latency")
+    parser.add_argument("--real-rate-limits", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="database file (default: a temporary file)")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", help="previous output file to compare with")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="zeri-bench-"), "database.db")
+    if os.path.exists(path):
+        parser.error(f"{path} already exists, the suite needs an empty database")
+    os.environ["DATABASE_PATH"] = path
+
+    dataset, results = asyncio.run(run_suite(args))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "db")},
+        "dataset": dataset,
+        "scenarios": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, r in results.items():
+        print(f"{name:<26} {r['count']:>7} in {r['seconds']:8.3f}s | p50 {r['p50_ms']:8.2f} ms | "
+              f"p99 {r['p99_ms']:8.2f} ms | rss {r['peak_rss_mb']:.0f} MB")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == "__main__":
+    main()
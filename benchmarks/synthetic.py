@@ -0,0 +1,79 @@
+"""
+Synthetic data generator: fills a database (real schema) with guilds, teams,
+players, availability slots and sessions.
+"""
+import datetime
+import random
+
+from modules.planning import team_key, merge_intervals
+
+GAME = "League of Legends"
+
+def generate(guilds, teams_per_guild, players_per_team, slots_per_day,
+             sessions_per_team, missing_ratio, seed, conn):
+    """
+    Inserts the synthetic dataset (runs on the writer thread).
+
+    Args:
+        guilds: Number of guilds (each configured with a default channel).
+        teams_per_guild: Teams per guild.
+        players_per_team: Players per team (each player is in exactly one team).
+        slots_per_day: Availability slots per player and day (may overlap).
+        sessions_per_team: Sessions per team, half in the past, half upcoming.
+        missing_ratio: Share of players with no availability (reminder targets).
+        seed: Random seed, for reproducible datasets.
+        conn: The database connection.
+
+    Returns:
+        dict: Counts of inserted rows and the list of (guild_id, team) pairs.
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+    cursor = conn.cursor()
+
+    configs, players, availability, sessions, teams = [], [], [], [], []
+    discord_id = 10 ** 17
+    for g in range(guilds):
+        # Snowflake-sized IDs, consecutive guilds on consecutive shards ((id >> 22) % count)
+        guild_id = 10 ** 17 + (g << 22) + g
+        configs.append((guild_id, guild_id + 1))
+        for t in range(teams_per_guild):
+            team = f"team {t}"
+            teams.append((guild_id, team))
+            for _ in range(players_per_team):
+                discord_id += 1
+                players.append((discord_id, guild_id, f"player{discord_id}", GAME, team, team_key(team)))
+                if rng.random() < missing_ratio:
+                    continue
+                for day in range(7):
+                    slots = []
+                    for _ in range(slots_per_day):
+                        start = rng.randint(8, 21)
+                        slots.append((start, rng.randint(start + 1, 23)))
+                    # Stored in canonical form, like the bot writes them
+                    availability.extend((discord_id, day, start, end) for start, end in merge_intervals(slots))
+            for s in range(sessions_per_team):
+                offset = rng.randint(1, 365) * (-1 if s % 2 else 1)
+                start = now + datetime.timedelta(days=offset, hours=rng.randint(-4, 4))
+                end = start + datetime.timedelta(hours=2)
+                sessions.append((guild_id, team, team_key(team), start.strftime("%d/%m/%Y"),
+                                 f"{start.hour}h - {end.hour}h", int(start.timestamp()), int(end.timestamp())))
+
+    cursor.executemany("INSERT INTO guild_configs (guild_id, default_channel_id) VALUES (?, ?)", configs)
+    cursor.executemany(
+        "INSERT INTO players (discord_id, guild_id, username, game, team, team_key) VALUES (?, ?, ?, ?, ?, ?)", players)
+    cursor.executemany("INSERT INTO availability (discord_id, day, start_time, end_time) VALUES (?, ?, ?, ?)", availability)
+    cursor.executemany(
+        "INSERT INTO sessions (guild_id, team, team_key, date, time, start_ts, end_ts) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        sessions)
+    conn.commit()
+    cursor.execute("ANALYZE")
+
+    return {
+        "guilds": len(configs),
+        "teams": len(teams),
+        "players": len(players),
+        "availability": len(availability),
+        "sessions": len(sessions),
+        "team_list": teams,
+    }
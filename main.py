@@ -10,14 +10,19 @@ from discord.ext import commands
 from dotenv import load_dotenv
 
 # Local Modules
-from modules.database import conn, init_database
-from modules.player_management import add_player, remove_player, add_availability
+from modules.database import run_read, init_database, close_database
+from modules.write_behind import write_queue
+from modules.player_management import add_player, remove_player, add_availability, remove_availability, add_week_availability, parse_week_availability
 from modules.affichages import display_team
-from modules.tasks import start_tasks
-from modules.planning import calculate_common_availability, get_player_availability
+from modules.tasks import start_tasks, init_external_writes_position
+from modules.planning import get_common_availability, get_player_availability, is_registered_anywhere
 from modules.session_management import schedule_session, list_sessions, delete_session
-from modules.config import config_channel, config_role
+from modules.reminders import session_reminders
+from modules.config import config_channel, config_role, load_guild_configs
 from modules.general import aide_command, info_command, report_command
+from modules.metrics import command_started, command_finished, start_metrics_server
+from modules.watchdog import start_watchdog
+from modules.sharding import parse_shard_ids, owns_shard
 
 # ... (rest of imports)
 
@@ -29,15 +34,49 @@ from modules.general import aide_command, info_command, report_command
 #           Configuration & Variables
 #------------------------------------------------------
 DAYS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+# Max slots listed by /voir_dispo in minimum mode (fits in one embed field)
+QUORUM_SLOTS_SHOWN = 20
 
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
 GUILD_ID = os.getenv('GUILD_ID')
+# Local Prometheus endpoint (disabled unless METRICS_PORT is set)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = os.getenv('METRICS_PORT')
+# Event loop watchdog: stall threshold in ms (disabled unless set), optional JSON lines file
+LOOP_WATCHDOG_MS = os.getenv('LOOP_WATCHDOG_MS')
+LOOP_WATCHDOG_LOG = os.getenv('LOOP_WATCHDOG_LOG')
+# Sharding: SHARD_COUNT=auto (all shards, count from Discord) or a number,
+# SHARD_IDS="0-3" to own only part of them (one process per range, same database;
+# requires a numeric SHARD_COUNT)
+SHARD_COUNT = os.getenv('SHARD_COUNT')
+SHARD_IDS = os.getenv('SHARD_IDS')
 
 intents = discord.Intents.default()
 intents.message_content = True 
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class InstrumentedTree(app_commands.CommandTree):
+    """
+    Command tree that stamps every interaction so its duration can be measured.
+    """
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        command_started(interaction)
+        return True
+
+# Owning part of the shards needs a fixed count: with "auto", every process would own them all
+if SHARD_IDS and not (SHARD_COUNT or "").isdigit():
+    raise SystemExit(f"SHARD_IDS={SHARD_IDS} requires a numeric SHARD_COUNT (got {SHARD_COUNT!r}).")
+
+if SHARD_COUNT:
+    shard_options = {}
+    if SHARD_COUNT != "auto":
+        shard_options["shard_count"] = int(SHARD_COUNT)
+        if SHARD_IDS:
+            shard_options["shard_ids"] = parse_shard_ids(SHARD_IDS)
+    bot = commands.AutoShardedBot(command_prefix="!", intents=intents, tree_cls=InstrumentedTree, **shard_options)
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents, tree_cls=InstrumentedTree)
 
 #------------------------------------------------------
 #           Events
@@ -48,14 +87,37 @@ async def on_ready():
     Event triggered when the bot is ready. 
     Syncs the slash commands.
     """
-    # 1. Initialize Database
-    init_database()
+    # 0. Event loop watchdog (first, so startup stalls are caught too)
+    if LOOP_WATCHDOG_MS:
+        try:
+            start_watchdog(float(LOOP_WATCHDOG_MS), LOOP_WATCHDOG_LOG)
+        except ValueError as e:
+            print(f"Watchdog error: {e}")
+
+    # 1. Initialize Database and load guild configurations
+    await init_database()
+    # Follow other processes' changes from here, before loading what they may change
+    await init_external_writes_position()
+    await load_guild_configs()
 
     # 2. Start Background Tasks
     start_tasks(bot)
+    try:
+        await session_reminders.start(bot)
+    except Exception as e:
+        print(f"Session reminder scheduler error: {e}")
+
+    # 2b. Metrics endpoint
+    if METRICS_PORT:
+        try:
+            await start_metrics_server(METRICS_HOST, int(METRICS_PORT))
+        except (OSError, ValueError) as e:
+            print(f"Metrics server error: {e}")
     
-    # 3. Command Sync
-    if GUILD_ID:
+    # 3. Command Sync (commands are global: one process is enough when sharded)
+    if not owns_shard(bot, 0):
+        print("Command sync left to the process owning shard 0.")
+    elif GUILD_ID:
         my_guild = discord.Object(id=int(GUILD_ID))
         # Copy global commands to the specific guild to insure instant updates during dev
         bot.tree.copy_global_to(guild=my_guild)
@@ -83,6 +145,8 @@ async def on_ready():
             print(f"Global Sync error: {e}")
         
     print(f'Connected as {bot.user}!')
+    if bot.shard_count:
+        print(f"Shards {getattr(bot, 'shard_ids', None) or [bot.shard_id]} of {bot.shard_count}.")
 
 @bot.event
 async def on_guild_join(guild):
@@ -117,11 +181,20 @@ async def on_guild_join(guild):
         except Exception as e:
             print(f"Failed to send welcome message in {guild.name}: {e}")
 
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    """
+    Event triggered when a slash command finished without error.
+    """
+    command_finished(interaction, command.qualified_name, "ok")
+
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
     """
     Global error handler for all app commands (slash commands).
     """
+    command_name = interaction.command.qualified_name if interaction.command else "unknown"
+    command_finished(interaction, command_name, "error")
     if interaction.response.is_done():
         await interaction.followup.send(f"Une erreur est survenue : {error}", ephemeral=True)
     else:
@@ -163,7 +236,7 @@ async def add(interaction: discord.Interaction,
     Slash command to add a player to the database.
     """
     await interaction.response.send_message("Joueur ajouté !")
-    await add_player(interaction, member, game, team, conn)
+    await add_player(interaction, member, game, team)
 
 
 @bot.tree.command(name="retirer", description="Retirer un joueur de la base de données")
@@ -172,7 +245,7 @@ async def remove(interaction: discord.Interaction, member: discord.Member):
     Slash command to remove a player from the database.
     """
     await interaction.response.send_message("Suppression du joueur...")
-    await remove_player(interaction, member, conn)
+    await remove_player(interaction, member)
 
 
 #------------------------------------------------------
@@ -204,7 +277,43 @@ async def availability_add(interaction: discord.Interaction,
          return
 
     await interaction.response.send_message("Traitement de la disponibilité...")
-    await add_availability(interaction, interaction.user, day_int, start_time, end_time, conn)
+    await add_availability(interaction, interaction.user, day_int, start_time, end_time)
+
+@bot.tree.command(name="retirer_dispo", description="Retirer un créneau de disponibilité")
+async def availability_remove(interaction: discord.Interaction, 
+                              day: Literal['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche'], 
+                              start_time: int, 
+                              end_time: int):
+    """
+    Slash command to remove hours from the availability of a specific day.
+    """
+    day_int = DAYS.index(day)
+
+    # Same validation as /ajout_dispo
+    if not (0 <= start_time <= 23) or not (0 <= end_time <= 23):
+         await interaction.response.send_message("Les heures doivent être comprises entre 0 et 23.", ephemeral=True)
+         return
+    if start_time >= end_time:
+         await interaction.response.send_message("L'heure de début doit être avant l'heure de fin.", ephemeral=True)
+         return
+
+    await remove_availability(interaction, interaction.user, day_int, start_time, end_time)
+
+@bot.tree.command(name="ajout_dispo_semaine", description="Remplir ses disponibilités pour plusieurs jours en une fois")
+@app_commands.describe(creneaux="Ex : Lundi 18-22, 14-16; Mardi 20-23; Dimanche - (« - » vide le jour)")
+async def availability_add_week(interaction: discord.Interaction, creneaux: str):
+    """
+    Slash command to replace availability for several days (several slots per day) at once.
+    """
+    # Validate everything before writing anything
+    try:
+        week = parse_week_availability(creneaux)
+    except ValueError as e:
+        await interaction.response.send_message(str(e), ephemeral=True)
+        return
+
+    await interaction.response.send_message("Traitement des disponibilités...")
+    await add_week_availability(interaction, interaction.user, week)
 
 
 #------------------------------------------------------
@@ -215,40 +324,75 @@ async def session_add(interaction: discord.Interaction, team: str, day: str, sta
     """
     Slash command to schedule a session.
     """
-    await schedule_session(interaction, team, day, start, end, conn)
+    await schedule_session(interaction, team, day, start, end)
 
 @bot.tree.command(name="liste_sessions", description="Voir les prochaines sessions d'une équipe")
 async def session_list(interaction: discord.Interaction, team: str):
     """
     Slash command to list upcoming sessions.
     """
-    await list_sessions(interaction, team, conn)
+    await list_sessions(interaction, team)
 
 @bot.tree.command(name="supprimer_session", description="Supprimer une session par son ID")
 async def session_delete(interaction: discord.Interaction, id: int):
     """
     Slash command to delete a session.
     """
-    await delete_session(interaction, id, conn)
+    await delete_session(interaction, id)
 
 
 #------------------------------------------------------
 #           Slash Commands : General Views
 #------------------------------------------------------
 @bot.tree.command(name="voir_dispo", description="Afficher les disponibilités pour une équipe ou un joueur")
-async def disponibilite(interaction: discord.Interaction, team: str = None, member: discord.Member = None):
+async def disponibilite(interaction: discord.Interaction, team: str = None, member: discord.Member = None, minimum: int = None):
     """
     Slash command to show availability.
+    With `minimum`, shows the team slots where at least that many members are free.
     """
     # Import locally to avoid circular imports? 
     # Not strictly necessary if imports are well organized, but keeping it safe as in original.
-    from modules.planning import calculate_common_availability, get_player_availability
+    from modules.planning import get_common_availability, get_player_availability, is_registered_anywhere, find_quorum_slots
 
     if team is None and member is None:
         await interaction.response.send_message("❌ Veuillez spécifier une **équipe** ou un **joueur**.", ephemeral=True)
         return
 
+    if minimum is not None and (team is None or minimum < 1):
+        await interaction.response.send_message("❌ Le **minimum** s'utilise avec une **équipe** et doit être au moins 1.", ephemeral=True)
+        return
+
     await interaction.response.defer()
+
+    # Read-your-writes: the caller's (and the member's) queued writes are committed first
+    await write_queue.flushed(interaction.user.id)
+    if member:
+        await write_queue.flushed(member.id)
+
+    if team and minimum is not None:
+        if not interaction.guild_id:
+            await interaction.followup.send("⚠️ Cette commande doit être utilisée sur un serveur.")
+            return
+
+        result = await run_read(find_quorum_slots, team, interaction.guild_id, minimum)
+        if result is None:
+            await interaction.followup.send(f"⚠️ L'équipe **{team}** n'existe pas ou n'a pas de membres.")
+            return
+
+        total, slots = result
+        embed = discord.Embed(
+            title=f"📅 Disponibilités - Équipe {team.title()} (min. {minimum}/{total})",
+            description=f"Créneaux où au moins **{minimum}** joueurs sont disponibles :",
+            color=discord.Color.blue()
+        )
+        if slots:
+            lines = [f"• {DAYS[day]} {start}h - {end}h : **{count}/{total}**" for day, start, end, count in slots[:QUORUM_SLOTS_SHOWN]]
+            embed.add_field(name="Meilleurs créneaux", value="\n".join(lines), inline=False)
+        else:
+            embed.description = "❌ Aucun créneau trouvé."
+            embed.color = discord.Color.red()
+        await interaction.followup.send(embed=embed)
+        return
     
     schedule = None
     title = ""
@@ -260,7 +404,7 @@ async def disponibilite(interaction: discord.Interaction, team: str = None, memb
             await interaction.followup.send("⚠️ Cette commande doit être utilisée sur un serveur.")
             return
             
-        schedule = calculate_common_availability(team, interaction.guild_id, conn)
+        schedule = await run_read(get_common_availability, team, interaction.guild_id)
         title = f"📅 Disponibilités communes - Équipe {team.title()}"
         description = "Voici les créneaux où tous les membres sont disponibles :"
         if schedule is None:
@@ -269,14 +413,11 @@ async def disponibilite(interaction: discord.Interaction, team: str = None, memb
              
     elif member:
         # Check if user exists in DB
-        cursor = conn.cursor()
-        cursor.execute("SELECT username FROM players WHERE discord_id = ?", (member.id,))
-        res = cursor.fetchone()
-        if not res:
+        if not await run_read(is_registered_anywhere, member.id):
              await interaction.followup.send(f"⚠️ Le joueur **{member.display_name}** n'est pas inscrit dans la base.")
              return
              
-        schedule = get_player_availability(member.id, conn)
+        schedule = await run_read(get_player_availability, member.id)
         title = f"📅 Disponibilités - {member.display_name}"
         description = "Voici les créneaux disponibles :"
 
@@ -303,12 +444,12 @@ async def disponibilite(interaction: discord.Interaction, team: str = None, memb
     await interaction.followup.send(embed=embed)
 
 
-@bot.tree.command(name="liste_joueurs", description="Afficher tous les joueurs enregistrés")
+@bot.tree.command(name="liste_joueurs", description="Afficher les joueurs enregistrés sur ce serveur")
 async def list_players(interaction: discord.Interaction):
     """
-    Slash command to list all registered players and teams.
+    Slash command to list the registered players and teams of the guild.
     """
-    await display_team(interaction, conn)
+    await display_team(interaction)
 
 #------------------------------------------------------
 #           Main Execution
@@ -320,9 +461,13 @@ if __name__ == "__main__":
         except KeyboardInterrupt:
             print("Bot stopped by user...")
         finally:
-            if conn:
-                conn.commit()
-                conn.close()
-                print("Database saved. 👋")
+            try:
+                flushed = write_queue.flush_blocking()
+                if flushed:
+                    print(f"{flushed} pending write(s) flushed.")
+            except Exception as e:
+                print(f"Error while flushing pending writes: {e}")
+            close_database()
+            print("Database saved. 👋")
     else:
         print("ERROR: No Token found!")
@@ -1,47 +1,157 @@
 #------------------------------------------------------
 #           Import
 #------------------------------------------------------
+import asyncio
 import sqlite3
 import discord
+from modules.database import run_read
 #------------------------------------------------------
 #           Functions
 #------------------------------------------------------
-async def display_team(interaction, conn):
+# Players shown per page of /liste_joueurs
+PLAYERS_PER_PAGE = 20
+
+def _fetch_players_page(guild_id, after, limit, conn):
     """
-    Fetches and displays the list of players grouped by game and team.
+    Returns up to `limit` players of a guild after the keyset cursor `after` (runs on a reader thread).
+    Rows are (game, team_key, username, discord_id, team), ordered by the first four columns,
+    which is also the cursor. Served by idx_players_listing: the cost only depends on the page size.
+    """
+    cursor = conn.cursor()
+    if after is None:
+        cursor.execute("""
+            SELECT game, team_key, username, discord_id, team FROM players
+            WHERE guild_id = ?
+            ORDER BY game, team_key, username, discord_id
+            LIMIT ?
+        """, (guild_id, limit))
+    else:
+        cursor.execute("""
+            SELECT game, team_key, username, discord_id, team FROM players
+            WHERE guild_id = ? AND (game, team_key, username, discord_id) > (?, ?, ?, ?)
+            ORDER BY game, team_key, username, discord_id
+            LIMIT ?
+        """, (guild_id, *after, limit))
+    return cursor.fetchall()
+
+def _build_team_embed(rows, page_number):
+    """
+    Builds the embed of one page, players grouped by game and team.
+    """
+    schedule = {}
+    
+    # Organize data into a nested dictionary: schedule[game][team] = [list of usernames]
+    for game, key, username, _discord_id, team in rows:
+        teams = schedule.setdefault(game, {})
+        if key not in teams:
+            teams[key] = (team.title(), [])
+        teams[key][1].append(username)
+        
+    embed = discord.Embed(title="Nos Équipes", color=discord.Color.blue())
+    for game in schedule:
+        game_description = ""
+        for team_display, usernames in schedule[game].values():
+            # Format player list with newlines
+            players = "\n".join(usernames)
+            game_description += f"**{team_display}**\n{players}\n\n"
+        embed.add_field(name=game, value=game_description, inline=False)
+    embed.set_footer(text=f"Page {page_number}")
+    return embed
+
+class TeamListView(discord.ui.View):
+    """
+    Previous/Next buttons for /liste_joueurs. Only the page being shown is fetched.
+    Only the user who ran the command can page; clicks are handled one at a time.
+    """
+
+    def __init__(self, author_id, guild_id, first_rows):
+        super().__init__(timeout=300)
+        self.author_id = author_id
+        self.guild_id = guild_id
+        # Keyset cursor of each visited page (None = first page)
+        self.page_starts = [None]
+        self.rows = first_rows
+        # Message holding the view (set by display_team), edited on timeout
+        self.message = None
+        self._lock = asyncio.Lock()
+        self._refresh_buttons()
+
+    @property
+    def has_next(self):
+        return len(self.rows) > PLAYERS_PER_PAGE
+
+    def page_embed(self):
+        return _build_team_embed(self.rows[:PLAYERS_PER_PAGE], len(self.page_starts))
+
+    def _refresh_buttons(self):
+        self.previous_page.disabled = len(self.page_starts) == 1
+        self.next_page.disabled = not self.has_next
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Seul l'auteur de la commande peut changer de page.", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass # Message deleted meanwhile
+
+    async def _show(self, interaction, page_starts):
+        """
+        Fetches the page starting at page_starts[-1]; the view state only changes once it is shown.
+        """
+        if self._lock.locked():
+            # A click is already being handled: ignore this one
+            await interaction.response.defer()
+            return
+        async with self._lock:
+            # One extra row tells whether a next page exists
+            rows = await run_read(_fetch_players_page, self.guild_id, page_starts[-1], PLAYERS_PER_PAGE + 1)
+            self.rows, self.page_starts = rows, page_starts
+            self._refresh_buttons()
+            await interaction.response.edit_message(embed=self.page_embed(), view=self)
+
+    @discord.ui.button(label="◀ Précédent", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page_starts[:-1] or [None])
+
+    @discord.ui.button(label="Suivant ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not self.has_next:
+            await interaction.response.defer()
+            return
+        await self._show(interaction, self.page_starts + [self.rows[PLAYERS_PER_PAGE - 1][:4]])
+
+async def display_team(interaction):
+    """
+    Fetches and displays the players of the current guild grouped by game and team,
+    one page at a time.
     
     Args:
         interaction: The Discord interaction object.
-        conn: The database connection.
     """
-    cursor = conn.cursor()
+    if not interaction.guild_id:
+        await interaction.response.send_message("Cette commande doit être utilisée sur un serveur.", ephemeral=True)
+        return
+
     try:
-        # Select all players ordered by game and team for grouping
-        cursor.execute("SELECT username, game, team FROM players ORDER BY game, team")
-        data = cursor.fetchall()
-        schedule = {}
-        
-        # Organize data into a nested dictionary: schedule[game][team] = [list of usernames]
-        for row in data: 
-            username, game, team = row
-            team_display = team.title()
-            
-            if game not in schedule:
-                schedule[game] = {}
-            if team_display not in schedule[game]:
-                schedule[game][team_display] = []
-            schedule[game][team_display].append(username)
-            
-        embed = discord.Embed(title="Nos Équipes", color=discord.Color.blue())
-        for game in schedule:
-            game_description = ""
-            for team in schedule[game]:
-                # Format player list with newlines
-                players = "\n".join(schedule[game][team])
-                game_description += f"**{team}**\n{players}\n\n"
-            embed.add_field(name=game, value=game_description, inline=False)
-                
-        await interaction.response.send_message(embed=embed)
+        rows = await run_read(_fetch_players_page, interaction.guild_id, None, PLAYERS_PER_PAGE + 1)
+        if not rows:
+            await interaction.response.send_message("Aucun joueur inscrit sur ce serveur.", ephemeral=True)
+            return
+
+        view = TeamListView(interaction.user.id, interaction.guild_id, rows)
+        if view.has_next:
+            await interaction.response.send_message(embed=view.page_embed(), view=view)
+            view.message = await interaction.original_response()
+        else:
+            await interaction.response.send_message(embed=view.page_embed())
     except Exception as e:
         print(f"Error in display_team: {e}")
         if interaction.response.is_done():
@@ -0,0 +1,113 @@
+#------------------------------------------------------
+#           Imports
+#------------------------------------------------------
+import threading
+from collections import OrderedDict
+
+#------------------------------------------------------
+#           Team Result Cache
+#------------------------------------------------------
+class TeamCache:
+    """
+    Bounded LRU cache of per-(guild_id, team_key) results.
+
+    Each entry remembers the members it was computed from, so that a change
+    to one user's data invalidates exactly the cached teams containing them.
+    Thread-safe: entries are read from the DB reader threads.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Incremented by every invalidation; results computed under an older
+        # generation may be stale and are not stored.
+        self.generation = 0
+        self._entries = OrderedDict()   # key -> (value, member_ids)
+        self._by_member = {}            # discord_id -> set of keys
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns (True, value) on a hit, (False, generation) on a miss.
+        The generation must be passed back to put().
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, self.generation
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, member_ids, generation):
+        """
+        Stores a result computed from `member_ids`, unless an invalidation
+        happened since the matching get().
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._discard(key)
+            self._entries[key] = (value, frozenset(member_ids))
+            for mid in member_ids:
+                self._by_member.setdefault(mid, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_key(self, key):
+        """
+        Drops one (guild_id, team_key) entry.
+        """
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._discard(key)
+
+    def invalidate_member(self, discord_id, guild_id=None):
+        """
+        Drops every entry computed with this member (optionally only in one guild).
+        """
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            for key in list(self._by_member.get(discord_id, ())):
+                if guild_id is None or key[0] == guild_id:
+                    self._discard(key)
+
+    def clear(self):
+        """
+        Drops every entry.
+        """
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._entries.clear()
+            self._by_member.clear()
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and current size.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def _discard(self, key):
+        # Caller holds the lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for mid in entry[1]:
+            keys = self._by_member.get(mid)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_member[mid]
@@ -0,0 +1,60 @@
+#------------------------------------------------------
+#           Imports
+#------------------------------------------------------
+import time
+
+from modules.database import transaction
+from modules.jobs import OWNER
+
+#------------------------------------------------------
+#           Change Log
+#------------------------------------------------------
+# Several processes can share the database (shards, hot standbys). Each one keeps
+# in-memory state (common availability cache, guild configs, reminder heap), so every
+# mutation appends what it changed to change_log, in the same unit of work. The other
+# processes read the new entries (tasks.external_writes_watch) and update only that.
+
+# Kinds of change: (guild_id, key) of the entry
+CHANGE_MEMBER = "member"                # (guild or None for global availability, discord_id)
+CHANGE_TEAM = "team"                    # (guild, team_key)
+CHANGE_AVAILABILITY = "availability"    # (None, None): bulk change (daily cleanup)
+CHANGE_CONFIG = "config"                # (guild, None)
+CHANGE_SESSION = "session"              # (guild, session id)
+
+# Entries older than this are pruned by the daily cleanup
+CHANGE_LOG_RETENTION_SECONDS = 24 * 3600
+
+def record_change(kind, guild_id, key, conn):
+    """
+    Appends a change to change_log. Must run inside the unit of work of the
+    mutation (no commit): the entry is committed with the change or not at all.
+    """
+    conn.execute(
+        "INSERT INTO change_log (origin, kind, guild_id, key, created_at) VALUES (?, ?, ?, ?, ?)",
+        (OWNER, kind, guild_id, key, time.time())
+    )
+
+def _last_change_id(conn):
+    """
+    Returns the ID of the latest change (runs on a reader thread).
+    """
+    return conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+
+def _fetch_changes(after, limit, conn):
+    """
+    Returns (id, origin, kind, guild_id, key) of the changes after `after` (runs on a reader thread).
+    A range scan of the primary key: the cost only depends on the number of new entries.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, origin, kind, guild_id, key FROM change_log WHERE id > ? ORDER BY id LIMIT ?",
+        (after, limit)
+    )
+    return cursor.fetchall()
+
+def _prune_changes(before, conn):
+    """
+    Deletes the changes recorded before `before` (runs on the writer thread).
+    """
+    with transaction(conn):
+        conn.execute("DELETE FROM change_log WHERE created_at < ?", (before,))
@@ -1,7 +1,127 @@
 import discord
 from discord import app_commands
 from typing import Literal
-from modules.database import conn
+from modules.database import run_read, run_write, transaction
+from modules.changes import CHANGE_CONFIG, record_change
+
+#------------------------------------------------------
+#           Guild Config Cache
+#------------------------------------------------------
+CONFIG_COLUMNS = ("guild_id", "default_channel_id", "planning_channel_id",
+                  "reminder_channel_id", "admin_role_id", "report_channel_id")
+_CONFIG_SELECT = f"SELECT {', '.join(CONFIG_COLUMNS)} FROM guild_configs"
+
+# guild_id -> {column: value}. Loaded at startup, kept current by the /config_* commands
+# (write-through), so permission checks and channel lookups never touch the database.
+_guild_configs = {}
+
+def _fetch_all_configs(conn):
+    """
+    Returns every guild_configs row (runs on a reader thread).
+    """
+    cursor = conn.cursor()
+    cursor.execute(_CONFIG_SELECT)
+    return cursor.fetchall()
+
+def _fetch_config(guild_id, conn):
+    """
+    Returns the guild_configs row of one guild.
+    """
+    cursor = conn.cursor()
+    cursor.execute(_CONFIG_SELECT + " WHERE guild_id = ?", (guild_id,))
+    return cursor.fetchone()
+
+def _cache_config(row):
+    """
+    Stores a guild_configs row in the cache.
+    """
+    config = dict(zip(CONFIG_COLUMNS, row))
+    _guild_configs[config["guild_id"]] = config
+
+async def load_guild_configs():
+    """
+    Loads every guild configuration into the in-memory cache.
+    """
+    rows = await run_read(_fetch_all_configs)
+    _guild_configs.clear()
+    for row in rows:
+        _cache_config(row)
+    print(f"Guild configs loaded ({len(_guild_configs)} guilds).")
+
+async def reload_guild_config(guild_id):
+    """
+    Reloads one guild configuration into the cache (changed by another process).
+    """
+    row = await run_read(_fetch_config, guild_id)
+    if row is None:
+        _guild_configs.pop(guild_id, None)
+    else:
+        _cache_config(row)
+
+def get_guild_config(guild_id):
+    """
+    Returns the cached configuration of a guild ({column: value}), or None if not configured.
+    """
+    return _guild_configs.get(guild_id)
+
+def all_guild_configs():
+    """
+    Returns the cached configurations of every configured guild.
+    """
+    return list(_guild_configs.values())
+
+def _save_channel(guild_id, channel_id, type_notif, conn):
+    """
+    Stores the notification channel for a guild (runs on the writer thread).
+    Returns the updated row.
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+
+        # Check if config exists for this guild
+        cursor.execute("SELECT 1 FROM guild_configs WHERE guild_id = ?", (guild_id,))
+        exists = cursor.fetchone()
+
+        if not exists:
+            # Create default entry
+            cursor.execute("INSERT INTO guild_configs (guild_id) VALUES (?)", (guild_id,))
+
+        # Update logic based on type
+        if type_notif == 'Global':
+            query = """
+                UPDATE guild_configs 
+                SET default_channel_id = ?, planning_channel_id = ?, reminder_channel_id = ? 
+                WHERE guild_id = ?
+            """
+            # If Global, we set ALL to this channel? Or just default? 
+            # Plan said: "If Global: Sets current channel as default for ALL notifications".
+            # Implication: Should we overwrite specific ones? Yes, to "reset" to a single channel.
+            cursor.execute(query, (channel_id, channel_id, channel_id, guild_id))
+
+        elif type_notif == 'Planning':
+             cursor.execute("UPDATE guild_configs SET planning_channel_id = ? WHERE guild_id = ?", (channel_id, guild_id))
+
+        elif type_notif == 'Rappels':
+             cursor.execute("UPDATE guild_configs SET reminder_channel_id = ? WHERE guild_id = ?", (channel_id, guild_id))
+        record_change(CHANGE_CONFIG, guild_id, None, conn)
+    return _fetch_config(guild_id, conn)
+
+def _save_role(guild_id, role_id, conn):
+    """
+    Stores the admin role for a guild (runs on the writer thread).
+    Returns the updated row.
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+
+        # Check if config exists
+        cursor.execute("SELECT 1 FROM guild_configs WHERE guild_id = ?", (guild_id,))
+        if cursor.fetchone() is None:
+            cursor.execute("INSERT INTO guild_configs (guild_id, admin_role_id) VALUES (?, ?)", (guild_id, role_id))
+        else:
+            cursor.execute("UPDATE guild_configs SET admin_role_id = ? WHERE guild_id = ?", (role_id, guild_id))
+        record_change(CHANGE_CONFIG, guild_id, None, conn)
+    return _fetch_config(guild_id, conn)
 
 async def config_channel(interaction: discord.Interaction, 
                          type_notif: Literal['Global', 'Planning', 'Rappels'] = 'Global'):
@@ -24,39 +144,17 @@ async def config_channel(interaction: discord.Interaction,
     channel_id = interaction.channel_id
     guild_id = interaction.guild_id
     
-    cursor = conn.cursor()
-    
     try:
-        # Check if config exists for this guild
-        cursor.execute("SELECT 1 FROM guild_configs WHERE guild_id = ?", (guild_id,))
-        exists = cursor.fetchone()
-        
-        if not exists:
-            # Create default entry
-            cursor.execute("INSERT INTO guild_configs (guild_id) VALUES (?)", (guild_id,))
-            
-        # Update logic based on type
+        row = await run_write(_save_channel, guild_id, channel_id, type_notif)
+        _cache_config(row)
+
         if type_notif == 'Global':
-            query = """
-                UPDATE guild_configs 
-                SET default_channel_id = ?, planning_channel_id = ?, reminder_channel_id = ? 
-                WHERE guild_id = ?
-            """
-            # If Global, we set ALL to this channel? Or just default? 
-            # Plan said: "If Global: Sets current channel as default for ALL notifications".
-            # Implication: Should we overwrite specific ones? Yes, to "reset" to a single channel.
-            cursor.execute(query, (channel_id, channel_id, channel_id, guild_id))
             msg = f"✅ Canal configuré comme **Global** (Défaut + Planning + Rappels) : <#{channel_id}>"
-            
         elif type_notif == 'Planning':
-             cursor.execute("UPDATE guild_configs SET planning_channel_id = ? WHERE guild_id = ?", (channel_id, guild_id))
-             msg = f"✅ Canal configuré pour le **Planning** : <#{channel_id}>"
-             
+            msg = f"✅ Canal configuré pour le **Planning** : <#{channel_id}>"
         elif type_notif == 'Rappels':
-             cursor.execute("UPDATE guild_configs SET reminder_channel_id = ? WHERE guild_id = ?", (channel_id, guild_id))
-             msg = f"✅ Canal configuré pour les **Rappels** : <#{channel_id}>"
-             
-        conn.commit()
+            msg = f"✅ Canal configuré pour les **Rappels** : <#{channel_id}>"
+
         await interaction.response.send_message(msg)
         
     except Exception as e:
@@ -79,17 +177,9 @@ async def config_role(interaction: discord.Interaction, role: discord.Role):
     guild_id = interaction.guild_id
     role_id = role.id
     
-    cursor = conn.cursor()
-    
     try:
-        # Check if config exists
-        cursor.execute("SELECT 1 FROM guild_configs WHERE guild_id = ?", (guild_id,))
-        if cursor.fetchone() is None:
-            cursor.execute("INSERT INTO guild_configs (guild_id, admin_role_id) VALUES (?, ?)", (guild_id, role_id))
-        else:
-            cursor.execute("UPDATE guild_configs SET admin_role_id = ? WHERE guild_id = ?", (role_id, guild_id))
-            
-        conn.commit()
+        row = await run_write(_save_role, guild_id, role_id)
+        _cache_config(row)
         await interaction.response.send_message(f"✅ Rôle **{role.name}** configuré comme gestionnaire du bot.")
     except Exception as e:
          print(f"Error in config_role: {e}")
@@ -1,14 +1,275 @@
+import asyncio
+import functools
+import os
+import random
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.request import pathname2url
 
-# Global connection object
-conn = sqlite3.connect('database.db')
+from modules.migrations import apply_migrations, get_schema_version
+from modules.metrics import DB_BUSY_RETRIES, DB_OPERATION_DURATION, DB_QUEUE_WAIT, SQL_DURATION, statement_label
 
-def init_database():
+DB_PATH = os.getenv('DATABASE_PATH', 'database.db')
+READER_COUNT = int(os.getenv('DATABASE_READERS', '4'))
+
+# Connection tuning
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16000
+
+# Retries of a whole database function on SQLITE_BUSY/LOCKED (other process holding
+# the write lock past busy_timeout, or a WAL snapshot that cannot be upgraded)
+BUSY_RETRIES = 4
+BUSY_BASE_DELAY = 0.05
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that records the time of every statement (zeri_sql_statement_duration_seconds),
+    including stepping through its rows: SQLite does most of the work of a SELECT
+    while rows are fetched, not in execute().
+
+    The time is observed once per statement, when its rows are exhausted (or on
+    fetchone(), fetchall(), the next execute(), close() or garbage collection).
+    """
+    _label = None
+    _elapsed = 0.0
+
+    def _run(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def _observe(self):
+        if self._label is not None:
+            SQL_DURATION.observe(self._elapsed, self._label)
+            self._label = None
+
+    def _start(self, sql, method, *args):
+        self._observe()
+        self._label = statement_label(sql)
+        self._elapsed = 0.0
+        try:
+            self._run(method, sql, *args)
+        finally:
+            if self.description is None:
+                # No result rows (writes, DDL): done already
+                self._observe()
+        return self
+
+    def execute(self, sql, parameters=()):
+        return self._start(sql, super().execute, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._start(sql, super().executemany, seq_of_parameters)
+
+    def fetchone(self):
+        # Used for single-row reads: the statement ends here
+        row = self._run(super().fetchone)
+        self._observe()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._run(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._observe()
+        return rows
+
+    def fetchall(self):
+        rows = self._run(super().fetchall)
+        self._observe()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._run(super().__next__)
+        except StopIteration:
+            self._observe()
+            raise
+
+    def close(self):
+        self._observe()
+        super().close()
+
+    def __del__(self):
+        self._observe()
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors (and execute shortcuts) are InstrumentedCursor.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def _connect(database, **kwargs):
+    """
+    Opens an instrumented connection usable from the DB threads.
+    """
+    return sqlite3.connect(database, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                           factory=InstrumentedConnection, **kwargs)
+
+def _configure(connection):
+    """
+    Applies the shared PRAGMAs to a new connection.
+    """
+    connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    # Negative value = size in KiB instead of pages
+    connection.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    return connection
+
+# Global writer connection.
+# Only ever used from the writer thread below (check_same_thread is relaxed because
+# the thread is created by the executor, not by the module import).
+conn = _configure(_connect(DB_PATH))
+# WAL lets readers run while the writer holds its lock; NORMAL is durable in WAL mode
+# except for the last transactions on power loss, and avoids one fsync per commit.
+conn.execute("PRAGMA journal_mode = WAL")
+conn.execute("PRAGMA synchronous = NORMAL")
+
+# One writer thread: writes are serialized here instead of running on the event loop.
+_writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zeri-db-writer")
+
+# N reader threads, each with its own read-only connection (opened on first use).
+_reader_executor = ThreadPoolExecutor(max_workers=READER_COUNT, thread_name_prefix="zeri-db-reader")
+_reader_local = threading.local()
+_reader_connections = []
+_reader_lock = threading.Lock()
+
+def _reader_connection():
+    """
+    Returns the read-only connection of the current reader thread.
+    """
+    reader = getattr(_reader_local, 'conn', None)
+    if reader is None:
+        uri = f"file:{pathname2url(os.path.abspath(DB_PATH))}?mode=ro"
+        reader = _configure(_connect(uri, uri=True))
+        _reader_local.conn = reader
+        with _reader_lock:
+            _reader_connections.append(reader)
+    return reader
+
+@contextmanager
+def transaction(connection):
+    """
+    Unit of work: BEGIN IMMEDIATE ... COMMIT, or ROLLBACK if the block raises.
+    Nested inside another unit of work, it becomes a savepoint (only the inner
+    block is rolled back).
+
+    BEGIN IMMEDIATE takes the write lock up front, so a transaction never fails
+    halfway on lock upgrade and nothing uncommitted is left for a later commit.
+    """
+    if connection.in_transaction:
+        connection.execute("SAVEPOINT unit_of_work")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK TO unit_of_work")
+            connection.execute("RELEASE unit_of_work")
+            raise
+        connection.execute("RELEASE unit_of_work")
+        return
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.rollback()
+        raise
+    connection.commit()
+
+def _is_busy(error):
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        # Extended codes (SQLITE_BUSY_SNAPSHOT...) keep the primary code in the low byte
+        return (code & 0xFF) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+def _call_with_retry(func, args, connection, mode):
+    """
+    Runs func(*args, connection), running it again on SQLITE_BUSY with exponential
+    backoff and jitter. Functions are units of work, so a failed try left nothing behind.
+    """
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return func(*args, connection)
+        except sqlite3.OperationalError as e:
+            if attempt == BUSY_RETRIES or not _is_busy(e):
+                raise
+            if connection.in_transaction:
+                connection.rollback()
+            DB_BUSY_RETRIES.inc(mode)
+            time.sleep(BUSY_BASE_DELAY * (2 ** attempt) * (0.5 + random.random()))
+
+def _timed_call(func, args, mode, queued_at):
+    """
+    Runs func(*args, conn) on the current DB thread and records queue wait and run time.
     """
-    Initializes the database by creating necessary tables.
+    DB_QUEUE_WAIT.observe(time.perf_counter() - queued_at, mode)
+    connection = _reader_connection() if mode == "read" else conn
+    with DB_OPERATION_DURATION.time(func.__name__, mode):
+        return _call_with_retry(func, args, connection, mode)
+
+async def run_read(func, *args):
+    """
+    Runs a read-only database function on a reader thread and awaits its result.
+    The connection is passed as the last positional argument: func(*args, conn).
+
+    Args:
+        func: The function to run. It must not write.
+        *args: Arguments passed before the connection.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_timed_call, func, args, "read", time.perf_counter())
+    return await loop.run_in_executor(_reader_executor, call)
+
+async def run_write(func, *args):
+    """
+    Runs a database function on the writer thread and awaits its result.
+    The connection is passed as the last positional argument: func(*args, conn).
+
+    Args:
+        func: The function to run.
+        *args: Arguments passed before the connection.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_timed_call, func, args, "write", time.perf_counter())
+    return await loop.run_in_executor(_writer_executor, call)
+
+def run_write_blocking(func, *args):
+    """
+    Runs a database function on the writer thread and waits for it, without an
+    event loop (shutdown path, see close_database).
+    """
+    return _writer_executor.submit(_timed_call, func, args, "write", time.perf_counter()).result()
+
+def close_database():
+    """
+    Waits for queued queries, then commits and closes every connection.
+    Safe to call once the event loop is stopped.
+    """
+    _reader_executor.shutdown(wait=True)
+    _writer_executor.shutdown(wait=True)
+    for reader in _reader_connections:
+        reader.close()
+    conn.commit()
+    conn.close()
+
+def _create_tables(conn):
+    """
+    Creates necessary tables (runs on the writer thread).
     """
     cursor = conn.cursor()
-    
+
     # 1. Guild Configs (NEW)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS guild_configs (
@@ -56,4 +317,19 @@ def init_database():
         )
     """)
     conn.commit()
-    print("Database initialized (V2.0 Schema).")
+
+def _setup_schema(conn):
+    """
+    Creates the base tables then applies pending migrations (runs on the writer thread).
+    Returns the resulting schema version.
+    """
+    _create_tables(conn)
+    apply_migrations(conn)
+    return get_schema_version(conn)
+
+async def init_database():
+    """
+    Initializes the database: base tables, then versioned migrations.
+    """
+    version = await run_write(_setup_schema)
+    print(f"Database initialized (V2.0 Schema, migration {version}).")
@@ -0,0 +1,193 @@
+#------------------------------------------------------
+#           Imports
+#------------------------------------------------------
+import asyncio
+import random
+import time
+from collections import Counter
+
+import aiohttp
+import discord
+
+# Errors worth retrying: server errors (5xx), network and timeouts.
+# Other HTTP errors (4xx: invalid embed, missing access...) are permanent,
+# except 429 rate limits that escaped discord.py.
+RETRYABLE_ERRORS = (discord.DiscordServerError, aiohttp.ClientError, asyncio.TimeoutError)
+RATE_LIMITED_STATUS = 429
+
+def is_retryable(error):
+    """
+    True if sending again may succeed (see RETRYABLE_ERRORS).
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, discord.HTTPException) and error.status == RATE_LIMITED_STATUS
+
+#------------------------------------------------------
+#           Rate Limiting & Fan-out
+#------------------------------------------------------
+class RateLimiter:
+    """
+    Token bucket shared by concurrent senders.
+    discord.py already waits on per-route buckets and 429s; this keeps a whole
+    fan-out under a global request rate so it never hits them in the first place.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Waits until one request may be sent.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class FanoutProgress:
+    """
+    Counts outcomes of a fan-out and logs progress and throughput.
+    """
+
+    def __init__(self, label, total, log_every=500, keep_failures=20):
+        self.label = label
+        self.total = total
+        self.log_every = log_every
+        self.keep_failures = keep_failures
+        self.sent = 0
+        self.failed = 0
+        self.errors = Counter()
+        self.failures = []
+        self.started = time.monotonic()
+
+    @property
+    def done(self):
+        return self.sent + self.failed
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def record(self, error=None, item=None):
+        """
+        Records one item (error is the exception if it failed, item describes it).
+        """
+        if error is None:
+            self.sent += 1
+        else:
+            self.failed += 1
+            self.errors[type(error).__name__] += 1
+            if item is not None and len(self.failures) < self.keep_failures:
+                self.failures.append(f"{item}: {error}")
+        if self.log_every and self.done % self.log_every == 0:
+            print(f"{self.label}: {self.done}/{self.total} ({self.failed} failed, {self.rate:.1f}/s)")
+
+    def summary(self):
+        """
+        Returns a one-line summary of the run.
+        """
+        line = (f"{self.label}: {self.sent} sent, {self.failed} failed out of {self.total} "
+                f"in {self.elapsed:.1f}s ({self.rate:.1f}/s)")
+        if self.errors:
+            line += " - errors: " + ", ".join(f"{name} x{count}" for name, count in self.errors.most_common())
+        if self.failures:
+            line += "\n  " + "\n  ".join(self.failures)
+            if self.failed > len(self.failures):
+                line += f"\n  ... and {self.failed - len(self.failures)} more"
+        return line
+
+async def fan_out(items, handler, concurrency, limiter=None, progress=None):
+    """
+    Runs `await handler(item)` for every item with at most `concurrency` in flight.
+
+    Args:
+        items: Iterable of items (consumed lazily).
+        handler: Coroutine function called with one item. Raising marks the item as failed.
+        concurrency: Number of concurrent workers.
+        limiter: Optional RateLimiter acquired before each call.
+        progress: Optional FanoutProgress updated after each call.
+    """
+    iterator = iter(items)
+
+    async def worker():
+        for item in iterator:
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                await handler(item)
+            except Exception as e:
+                if progress is not None:
+                    progress.record(e)
+                continue
+            if progress is not None:
+                progress.record()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+async def send_with_retry(send, attempts=3, base_delay=1.0):
+    """
+    Awaits `send()`, retrying transient Discord/network errors with
+    exponential backoff and jitter. Permanent errors (4xx) are raised immediately.
+    """
+    for attempt in range(attempts):
+        try:
+            return await send()
+        except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == attempts - 1 or not is_retryable(e):
+                raise
+            await asyncio.sleep(base_delay * (2 ** attempt) * (0.5 + random.random()))
+
+async def post_by_channel(jobs, concurrency, limiter=None, progress=None, attempts=3, on_sent=None,
+                          keep_going=None):
+    """
+    Posts messages with one queue per channel: messages of a channel are sent
+    in order by a single worker (so a guild with many teams does not trip the
+    per-channel limit), and at most `concurrency` channels are served at once.
+
+    Args:
+        jobs: Iterable of (channel, description, send_kwargs).
+        concurrency: Number of channels served concurrently.
+        limiter: Optional RateLimiter acquired before each message.
+        progress: Optional FanoutProgress updated after each message.
+        attempts: Attempts per message (see send_with_retry).
+        on_sent: Optional callback called with the description of each message sent.
+        keep_going: Optional callable checked before each message; every channel
+            stops once it returns False (e.g. job lease lost).
+    """
+    queues = {}
+    for channel, description, kwargs in jobs:
+        queues.setdefault(channel.id, (channel, []))[1].append((description, kwargs))
+
+    async def drain(queue):
+        channel, messages = queue
+        for description, kwargs in messages:
+            if keep_going is not None and not keep_going():
+                return
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                await send_with_retry(lambda: channel.send(**kwargs), attempts=attempts)
+            except Exception as e:
+                if progress is not None:
+                    progress.record(e, item=description)
+                continue
+            if on_sent is not None:
+                on_sent(description)
+            if progress is not None:
+                progress.record()
+
+    await fan_out(queues.values(), drain, concurrency)
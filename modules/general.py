@@ -17,7 +17,7 @@ async def aide_command(interaction: discord.Interaction):
         value=(
             "`/ajouter [membre] [jeu] [équipe]` : Ajouter un joueur à une équipe.\n"
             "`/retirer [membre]` : Supprimer un joueur de la base.\n"
-            "`/liste_joueurs` : Afficher tous les joueurs par équipe."
+            "`/liste_joueurs` : Afficher les joueurs du serveur par équipe."
         ),
         inline=False
     )
@@ -26,8 +26,11 @@ async def aide_command(interaction: discord.Interaction):
     embed.add_field(
         name="📅 Disponibilités",
         value=(
-            "`/ajout_dispo [jour] [début] [fin]` : Ajouter vos dispos (ex: Lundi 20h-22h).\n"
-            "`/voir_dispo [équipe|membre]` : Voir les créneaux communs ou d'un joueur."
+            "`/ajout_dispo [jour] [début] [fin]` : Ajouter un créneau (ex: Lundi 20h-22h), plusieurs par jour possibles.\n"
+            "`/retirer_dispo [jour] [début] [fin]` : Retirer des heures de vos dispos.\n"
+            "`/ajout_dispo_semaine [créneaux]` : Toute la semaine d'un coup (ex: Lundi 18-22, 14-16; Mardi 20-23).\n"
+            "`/voir_dispo [équipe|membre]` : Voir les créneaux communs ou d'un joueur.\n"
+            "`/voir_dispo [équipe] [minimum]` : Créneaux où au moins N joueurs sont dispo."
         ),
         inline=False
     )
@@ -36,7 +39,7 @@ async def aide_command(interaction: discord.Interaction):
     embed.add_field(
         name="🎮 Planning & Sessions",
         value=(
-            "`/planifier_session [équipe] [jour] [debut] [fin]` : Créer une session.\n"
+            "`/planifier_session [équipe] [jour] [debut] [fin]` : Créer une session (rappel 1 h avant).\n"
             "`/liste_sessions [équipe]` : Voir les prochaines sessions.\n"
             "`/supprimer_session [ID]` : Annuler une session."
         ),
@@ -0,0 +1,229 @@
+#------------------------------------------------------
+#           Imports
+#------------------------------------------------------
+import asyncio
+import os
+import socket
+import time
+import uuid
+
+from modules.database import run_read, run_write, transaction
+
+#------------------------------------------------------
+#           Configuration
+#------------------------------------------------------
+# A leader that stops renewing (crash, network loss) is replaced after this delay
+LEASE_SECONDS = 60
+# Progress flush (and lease renewal) period of a running job: at most this much
+# work is redone after a failover
+PROGRESS_FLUSH_SECONDS = 2
+
+# Identifies this process in job_leases
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Jobs currently running in this process (the lease alone would let us re-enter)
+_active_jobs = set()
+
+#------------------------------------------------------
+#           Database Helpers
+#------------------------------------------------------
+def _claim(job, period, owner, now, lease_seconds, conn):
+    """
+    Takes (or renews) the lease of a job and opens its run for the period (runs on the writer thread).
+    Returns the items already handled for the period, or None if another process
+    holds the lease or the period is already done.
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO job_leases (job, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (job) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE job_leases.owner = excluded.owner OR job_leases.expires_at < ?
+        """, (job, owner, now + lease_seconds, now))
+        if cursor.rowcount == 0:
+            return None
+
+        cursor.execute("SELECT status FROM job_runs WHERE job = ? AND period = ?", (job, period))
+        row = cursor.fetchone()
+        if row and row[0] == "done":
+            cursor.execute("DELETE FROM job_leases WHERE job = ? AND owner = ?", (job, owner))
+            return None
+        if row is None:
+            cursor.execute(
+                "INSERT INTO job_runs (job, period, status, updated_at) VALUES (?, ?, 'running', ?)",
+                (job, period, now)
+            )
+        cursor.execute("SELECT item FROM job_progress WHERE job = ? AND period = ?", (job, period))
+        return {item for (item,) in cursor.fetchall()}
+
+def _save_progress(job, period, owner, items, now, lease_seconds, conn):
+    """
+    Records handled items and extends the lease (runs on the writer thread).
+    Returns False if the lease was lost to another process.
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE job_leases SET expires_at = ? WHERE job = ? AND owner = ?",
+            (now + lease_seconds, job, owner)
+        )
+        kept = cursor.rowcount > 0
+        cursor.executemany(
+            "INSERT OR IGNORE INTO job_progress (job, period, item) VALUES (?, ?, ?)",
+            [(job, period, item) for item in items]
+        )
+        cursor.execute("UPDATE job_runs SET updated_at = ? WHERE job = ? AND period = ?", (now, job, period))
+    return kept
+
+def _finish(job, period, owner, completed, now, conn):
+    """
+    Releases the lease; if completed, marks the period done and drops older runs (runs on the writer thread).
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+        if completed:
+            cursor.execute(
+                "UPDATE job_runs SET status = 'done', updated_at = ? WHERE job = ? AND period = ?",
+                (now, job, period)
+            )
+            cursor.execute("DELETE FROM job_runs WHERE job = ? AND period <> ?", (job, period))
+            cursor.execute("DELETE FROM job_progress WHERE job = ?", (job,))
+        cursor.execute("DELETE FROM job_leases WHERE job = ? AND owner = ?", (job, owner))
+
+def _fetch_unfinished_runs(jobs, conn):
+    """
+    Returns (job, period) of runs left 'running' among the given jobs (runs on a reader thread).
+    """
+    cursor = conn.cursor()
+    placeholders = ",".join("?" * len(jobs))
+    cursor.execute(
+        f"SELECT job, period FROM job_runs WHERE status = 'running' AND job IN ({placeholders})",
+        list(jobs)
+    )
+    return cursor.fetchall()
+
+#------------------------------------------------------
+#           Job Runs
+#------------------------------------------------------
+class JobRun:
+    """
+    A job run owned by this process: skips items handled before a failover
+    and persists the new ones while keeping the lease alive.
+    """
+
+    def __init__(self, job, period, done):
+        self.job = job
+        self.period = period
+        self.done = done
+        self.lost = False
+        self._buffer = []
+
+    def pending(self, items, key):
+        """
+        Returns the items not handled yet (str(key(item)) is their progress ID).
+        """
+        return [item for item in items if str(key(item)) not in self.done]
+
+    def while_held(self, items):
+        """
+        Yields items until the lease is lost, so the new leader does not duplicate work.
+        """
+        for item in items:
+            if self.lost:
+                return
+            yield item
+
+    def mark_done(self, item_key):
+        """
+        Records one handled item (written with the next flush).
+        """
+        item_key = str(item_key)
+        if item_key not in self.done:
+            self.done.add(item_key)
+            self._buffer.append(item_key)
+
+    async def flush(self):
+        """
+        Writes buffered progress and renews the lease.
+        """
+        items, self._buffer = self._buffer, []
+        try:
+            kept = await run_write(_save_progress, self.job, self.period, OWNER, items, time.time(), LEASE_SECONDS)
+        except Exception:
+            # Written with the next flush
+            self._buffer = items + self._buffer
+            raise
+        if not kept and not self.lost:
+            self.lost = True
+            print(f"Job {self.job} ({self.period}): lease lost, stopping.")
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(PROGRESS_FLUSH_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                # Retried at the next period; if it keeps failing the lease expires
+                # and the next successful flush reports it lost
+                print(f"Job {self.job} ({self.period}): progress flush failed: {e}")
+
+async def run_job(job, period, work):
+    """
+    Runs `await work(run)` if this process wins the job lease for the period.
+
+    Only one process runs a job at a time; the others are hot standbys. Progress
+    is persisted, so if the leader dies mid-run, the next process to claim the same
+    period (see resume_unfinished_jobs) resumes with the items still to do.
+
+    Args:
+        job: Job name (unique across processes that must not run it twice).
+        period: Period key (date, ISO week...): a period is run to completion once.
+        work: Coroutine function called with the JobRun.
+
+    Returns:
+        bool: True if the job ran to completion here.
+    """
+    if job in _active_jobs:
+        return False
+    _active_jobs.add(job)
+    try:
+        done = await run_write(_claim, job, period, OWNER, time.time(), LEASE_SECONDS)
+    except Exception:
+        _active_jobs.discard(job)
+        raise
+    if done is None:
+        _active_jobs.discard(job)
+        return False
+    if done:
+        print(f"Job {job} ({period}): resuming, {len(done)} item(s) already done.")
+
+    run = JobRun(job, period, done)
+    keep_alive = asyncio.create_task(run._keep_alive())
+    completed = False
+    try:
+        await work(run)
+        completed = not run.lost
+    finally:
+        keep_alive.cancel()
+        try:
+            await run.flush()
+            await run_write(_finish, job, period, OWNER, completed and not run.lost, time.time())
+        except Exception as e:
+            print(f"Job {job} ({period}): could not save progress: {e}")
+        _active_jobs.discard(job)
+    return completed
+
+async def resume_unfinished_jobs(runners):
+    """
+    Resumes runs left unfinished by a process that stopped mid-run.
+
+    Args:
+        runners: {job name: (current period, coroutine function called with the period)}.
+            Runs of another period are stale and left alone.
+    """
+    if not runners:
+        return
+    for job, period in await run_read(_fetch_unfinished_runs, list(runners)):
+        current_period, runner = runners[job]
+        if period == current_period:
+            await runner(period)
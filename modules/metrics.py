@@ -0,0 +1,230 @@
+#------------------------------------------------------
+#           Imports
+#------------------------------------------------------
+import asyncio
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+#------------------------------------------------------
+#           Metric Types
+#------------------------------------------------------
+# Seconds; covers sub-millisecond SQL up to long background runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+class Counter:
+    """
+    Monotonic counter with labels. Thread-safe (DB threads record too).
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    """
+    Cumulative histogram with labels, Prometheus style. Thread-safe.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(names, labels + (repr(bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+class Gauge:
+    """
+    Value read at scrape time from a callback returning {labels tuple: value}.
+    """
+
+    def __init__(self, name, documentation, labelnames, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(self.callback().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+_registry = []
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+def render():
+    """
+    Returns every registered metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+#------------------------------------------------------
+#           Bot Metrics
+#------------------------------------------------------
+COMMAND_DURATION = register(Histogram(
+    "zeri_command_duration_seconds", "Slash command handling time.", ("command",)))
+COMMANDS = register(Counter(
+    "zeri_commands_total", "Slash commands handled.", ("command", "status")))
+DB_OPERATION_DURATION = register(Histogram(
+    "zeri_db_operation_duration_seconds",
+    "Time of a database function run on a DB thread, queries and Python work included.",
+    ("operation", "mode")))
+DB_QUEUE_WAIT = register(Histogram(
+    "zeri_db_queue_wait_seconds", "Time a database function waited for a free DB thread.", ("mode",)))
+DB_BUSY_RETRIES = register(Counter(
+    "zeri_db_busy_retries_total", "Database functions run again after SQLITE_BUSY/LOCKED.", ("mode",)))
+SQL_DURATION = register(Histogram(
+    "zeri_sql_statement_duration_seconds", "Statement time (execute and row fetching) per statement kind.", ("statement",)))
+TASK_DURATION = register(Histogram(
+    "zeri_task_duration_seconds", "Background task run time.", ("task",)))
+TASK_RUNS = register(Counter(
+    "zeri_task_runs_total", "Background task runs.", ("task", "status")))
+LOOP_LAG = register(Histogram(
+    "zeri_event_loop_lag_seconds", "How late the watchdog heartbeat woke up (event loop scheduling delay).",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)))
+LOOP_STALLS = register(Counter(
+    "zeri_event_loop_stalls_total", "Heartbeats later than the watchdog threshold."))
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|ON|TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+(\w+)", re.IGNORECASE)
+
+def statement_label(sql):
+    """
+    Low-cardinality label of a SQL statement: verb and first table ("SELECT players").
+    """
+    words = sql.split(None, 1)
+    if not words:
+        return "OTHER"
+    verb = words[0].upper()
+    table = _TABLE_RE.search(sql)
+    return f"{verb} {table.group(1)}" if table else verb
+
+@contextmanager
+def track_task(name):
+    """
+    Times a background task run and counts it as ok/error.
+    """
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        TASK_DURATION.observe(time.perf_counter() - started, name)
+        TASK_RUNS.inc(name, status)
+
+def command_started(interaction):
+    """
+    Stamps the interaction with its start time (see command_finished).
+    """
+    interaction.extras["metrics_started"] = time.perf_counter()
+
+def command_finished(interaction, command_name, status):
+    """
+    Records the duration and outcome of a slash command.
+    """
+    started = interaction.extras.pop("metrics_started", None)
+    if started is not None:
+        COMMAND_DURATION.observe(time.perf_counter() - started, command_name)
+    COMMANDS.inc(command_name, status)
+
+#------------------------------------------------------
+#           HTTP Endpoint
+#------------------------------------------------------
+_server = None
+
+async def _handle_request(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Skip headers
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+            body = render().encode()
+            status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = b"Not Found\n"
+            status, content_type = "404 Not Found", "text/plain"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_metrics_server(host, port):
+    """
+    Serves the metrics on http://host:port/metrics (once per process).
+    """
+    global _server
+    if _server is not None:
+        return
+    _server = await asyncio.start_server(_handle_request, host, port)
+    print(f"Metrics available on http://{host}:{port}/metrics")
@@ -0,0 +1,267 @@
+#------------------------------------------------------
+#           Schema Migrations
+#------------------------------------------------------
+# Each migration is applied once, in order, inside its own transaction.
+# The applied version is recorded in the `schema_version` table.
+# Migrations must be idempotent (IF NOT EXISTS...) so that a database
+# created before the runner existed can be upgraded safely.
+import datetime
+import re
+
+from modules.planning import team_key, merge_intervals
+
+def _has_column(conn, table, column):
+    """
+    Checks if a table already has a column (ALTER TABLE ADD COLUMN is not idempotent).
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+def _migration_hot_query_indexes(conn):
+    """
+    Adds the indexes used by availability, team and session lookups.
+    """
+    cursor = conn.cursor()
+    # Covering index: team availability is read entirely from the index
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_availability_user_day
+        ON availability (discord_id, day, start_time, end_time)
+    """)
+    # Daily cleanup deletes by day
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_availability_day ON availability (day)")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_guild_team
+        ON players (guild_id, team, discord_id, username)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_guild_team ON sessions (guild_id, team)")
+
+def _migration_team_key(conn):
+    """
+    Adds the normalized team_key column to players and sessions, backfills it
+    and replaces the team indexes with (guild_id, team_key) ones.
+    """
+    cursor = conn.cursor()
+    for table in ("players", "sessions"):
+        if not _has_column(conn, table, "team_key"):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN team_key TEXT")
+        cursor.execute(f"SELECT rowid, team FROM {table} WHERE team IS NOT NULL")
+        updates = [(team_key(team), rowid) for rowid, team in cursor.fetchall()]
+        cursor.executemany(f"UPDATE {table} SET team_key = ? WHERE rowid = ?", updates)
+
+    cursor.execute("DROP INDEX IF EXISTS idx_players_guild_team")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_guild_team_key
+        ON players (guild_id, team_key, discord_id, username)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_guild_team")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_guild_team_key ON sessions (guild_id, team_key)")
+
+def _migration_session_timestamps(conn):
+    """
+    Adds sortable start_ts/end_ts (epoch seconds, local time) to sessions,
+    parses them from the existing date/time display columns and indexes upcoming lookups.
+    """
+    cursor = conn.cursor()
+    for column in ("start_ts", "end_ts"):
+        if not _has_column(conn, "sessions", column):
+            cursor.execute(f"ALTER TABLE sessions ADD COLUMN {column} INTEGER")
+
+    cursor.execute("SELECT id, date, time, duration FROM sessions WHERE start_ts IS NULL")
+    updates = []
+    for session_id, date, time, duration in cursor.fetchall():
+        try:
+            day_start = datetime.datetime.strptime(date, "%d/%m/%Y")
+        except (TypeError, ValueError):
+            print(f"Migration: session {session_id} has an unreadable date ({date!r}), left without timestamps.")
+            continue
+        # time is a display string such as "20h - 22h"
+        hours = [int(h) for h in re.findall(r"(\d+)", time or "")]
+        start_hour = hours[0] if hours else 0
+        end_hour = hours[1] if len(hours) > 1 else start_hour + (duration or 2)
+        start_ts = int((day_start + datetime.timedelta(hours=start_hour)).timestamp())
+        end_ts = int((day_start + datetime.timedelta(hours=end_hour)).timestamp())
+        updates.append((start_ts, end_ts, session_id))
+    cursor.executemany("UPDATE sessions SET start_ts = ?, end_ts = ? WHERE id = ?", updates)
+
+    # (guild_id, team_key) is a prefix of the new index
+    cursor.execute("DROP INDEX IF EXISTS idx_sessions_guild_team_key")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_upcoming ON sessions (guild_id, team_key, start_ts)")
+
+def _migration_players_listing_index(conn):
+    """
+    Covering index for the guild-scoped, keyset-paginated player listing.
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_listing
+        ON players (guild_id, game, team_key, username, discord_id, team)
+    """)
+
+def _migration_job_leases(conn):
+    """
+    Tables for background job leader election and resumable progress (see modules/jobs.py).
+    """
+    cursor = conn.cursor()
+    # One lease per job: the process holding an unexpired lease is the leader
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_leases (
+            job TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+    # Last run of each job: period (day, ISO week...) and status (running/done)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            job TEXT,
+            period TEXT,
+            status TEXT NOT NULL,
+            updated_at REAL,
+            PRIMARY KEY (job, period)
+        )
+    """)
+    # Items already handled by the running period (recap posted, DM sent...)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_progress (
+            job TEXT,
+            period TEXT,
+            item TEXT,
+            PRIMARY KEY (job, period, item)
+        ) WITHOUT ROWID
+    """)
+
+def _migration_canonical_availability(conn):
+    """
+    Rewrites every user day in canonical form (sorted, merged, non-overlapping slots)
+    and enforces one slot per start hour.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT discord_id, day, start_time, end_time FROM availability ORDER BY discord_id, day")
+    days = {}
+    for discord_id, day, start, end in cursor.fetchall():
+        days.setdefault((discord_id, day), []).append((start, end))
+
+    # Only the days that are not canonical yet are rewritten
+    rewrites = {}
+    for key, slots in days.items():
+        canonical = merge_intervals(slots)
+        if canonical != sorted(slots):
+            rewrites[key] = canonical
+    cursor.executemany("DELETE FROM availability WHERE discord_id = ? AND day = ?", list(rewrites))
+    cursor.executemany(
+        "INSERT INTO availability (discord_id, day, start_time, end_time) VALUES (?, ?, ?, ?)",
+        [(discord_id, day, start, end) for (discord_id, day), slots in rewrites.items() for start, end in slots]
+    )
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_availability_slot
+        ON availability (discord_id, day, start_time)
+    """)
+
+def _migration_session_reminders(conn):
+    """
+    Flags sessions whose reminder was sent, and indexes the ones still to remind
+    (startup load of the reminder scheduler).
+    """
+    if not _has_column(conn, "sessions", "reminder_sent"):
+        conn.execute("ALTER TABLE sessions ADD COLUMN reminder_sent INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_reminder_pending
+        ON sessions (start_ts) WHERE reminder_sent = 0
+    """)
+
+def _migration_session_bounds(conn):
+    """
+    Brings stored sessions within the bounds the overlap checks assume
+    (0 < end_ts - start_ts <= 24 h): an end before the start ("22h - 1h",
+    backfilled by migration 3) is the next day, longer sessions are clamped.
+    """
+    cursor = conn.cursor()
+    cursor.execute("UPDATE sessions SET end_ts = end_ts + 86400 WHERE end_ts <= start_ts")
+    cursor.execute("UPDATE sessions SET end_ts = start_ts + 86400 WHERE end_ts - start_ts > 86400")
+
+def _migration_change_log(conn):
+    """
+    Change log shared by the processes of one database (see modules/changes.py).
+    AUTOINCREMENT: IDs are never reused after pruning, readers keep their position.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            guild_id INTEGER,
+            key,
+            created_at REAL NOT NULL
+        )
+    """)
+
+# (version, description, function) - append only, never renumber
+MIGRATIONS = [
+    (1, "Indexes for hot queries", _migration_hot_query_indexes),
+    (2, "Normalized team_key column", _migration_team_key),
+    (3, "Session start/end timestamps", _migration_session_timestamps),
+    (4, "Player listing index", _migration_players_listing_index),
+    (5, "Background job leases and progress", _migration_job_leases),
+    (6, "Canonical availability slots", _migration_canonical_availability),
+    (7, "Session reminder flag", _migration_session_reminders),
+    (8, "Session duration bounds", _migration_session_bounds),
+    (9, "Change log for multi-process caches", _migration_change_log),
+]
+
+def get_schema_version(conn):
+    """
+    Returns the latest applied migration version (0 if none).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    version = cursor.fetchone()[0]
+    return version or 0
+
+def apply_migrations(conn):
+    """
+    Applies every pending migration in order.
+
+    Args:
+        conn: The database connection (writer).
+
+    Returns:
+        list: Versions applied during this call.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    """)
+    conn.commit()
+
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            # IMMEDIATE: another process starting at the same time waits here,
+            # then sees the version it applied
+            conn.execute("BEGIN IMMEDIATE")
+            if get_schema_version(conn) >= version:
+                conn.commit()
+                current = version
+                continue
+            migrate(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.datetime.now().isoformat(timespec='seconds'))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            print(f"Migration {version} ({description}) failed, database left at version {current}.")
+            raise
+        current = version
+        applied.append(version)
+        print(f"Migration {version} applied: {description}.")
+
+    return applied
@@ -1,100 +1,300 @@
 import sqlite3
+import time
+import unicodedata
+from array import array
+
+from modules.cache import TeamCache
+from modules.metrics import Gauge, register
+
+def team_key(team_name):
+    """
+    Returns the normalized lookup key of a team name:
+    trimmed, case-folded and without accents ("  Équipe A " -> "equipe a").
+    Stored in players.team_key / sessions.team_key and used by every team lookup.
+    """
+    decomposed = unicodedata.normalize('NFKD', team_name.strip().casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+# Week bitset: bit (day * 24 + hour) is set when the hour [hour, hour + 1) is free.
+HOURS_PER_DAY = 24
+DAY_MASK = (1 << HOURS_PER_DAY) - 1
+WEEK_MASK = (1 << (7 * HOURS_PER_DAY)) - 1
+
+def _fetch_team_members(team_name, guild_id, conn):
+    """
+    Returns (discord_id, username) of the members of a team in a guild.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT discord_id, username FROM players WHERE guild_id = ? AND team_key = ?", (guild_id, team_key(team_name)))
+    return cursor.fetchall()
+
+def slot_mask(day, start, end):
+    """
+    Returns the week bitset of a single slot.
+    """
+    if start >= end:
+        return 0
+    return ((1 << (end - start)) - 1) << (day * HOURS_PER_DAY + start)
+
+def mask_to_schedule(mask):
+    """
+    Decodes a week bitset into {day: [(start, end), ...]} runs (sorted, disjoint).
+    """
+    schedule = {}
+    for day in range(7):
+        day_bits = (mask >> (day * HOURS_PER_DAY)) & DAY_MASK
+        runs = []
+        while day_bits:
+            start = (day_bits & -day_bits).bit_length() - 1
+            shifted = day_bits >> start
+            # Number of consecutive set bits from `start`
+            length = (~shifted & (shifted + 1)).bit_length() - 1
+            runs.append((start, start + length))
+            day_bits &= ~(((1 << length) - 1) << start)
+        schedule[day] = runs
+    return schedule
+
+def get_availability_masks(member_ids, conn):
+    """
+    Builds the week bitset of each member from the availability table.
+
+    Returns:
+        dict: {discord_id: mask}, 0 for members without availability.
+    """
+    masks = {mid: 0 for mid in member_ids}
+    if not member_ids:
+        return masks
+    cursor = conn.cursor()
+    placeholders = ','.join('?' for _ in member_ids)
+    cursor.execute(f"""
+        SELECT discord_id, day, start_time, end_time
+        FROM availability
+        WHERE discord_id IN ({placeholders})
+    """, list(member_ids))
+    for uid, day, start, end in cursor:
+        masks[uid] |= slot_mask(day, start, end)
+    return masks
+
+def _common_mask(member_ids, conn):
+    common = WEEK_MASK
+    for mask in get_availability_masks(member_ids, conn).values():
+        common &= mask
+        if not common:
+            break
+    return common
+
+def _compute_common_availability(team_name, guild_id, conn):
+    """
+    Returns (member_ids, schedule) of a team, or (None, None) if it doesn't exist.
+    """
+    members = _fetch_team_members(team_name, guild_id, conn)
+    if not members:
+        return None, None
+    member_ids = [m[0] for m in members]
+    return member_ids, mask_to_schedule(_common_mask(member_ids, conn))
 
 def calculate_common_availability(team_name, guild_id, conn):
     """
-    Calculates the common availability slots for a given team in a specific guild.
-    
+    Calculates the common availability slots for a given team in a specific guild:
+    the AND of the members' week masks. Uncached, see get_common_availability.
+
     Args:
         team_name: The name of the team.
         guild_id: The ID of the guild (server).
         conn: The database connection.
-        
+
     Returns:
         dict: A dictionary where keys are days (0-6) and values are lists of compatible (start, end) tuples.
         Returns None if the team doesn't exist or is empty.
     """
-    cursor = conn.cursor()
-    
-    # 1. Get all members of the team (case-insensitive search) IN THIS GUILD
-    cursor.execute("SELECT discord_id, username FROM players WHERE LOWER(team) = ? AND guild_id = ?", (team_name.strip().lower(), guild_id))
-    members = cursor.fetchall()
-    
-    if not members:
+    return _compute_common_availability(team_name, guild_id, conn)[1]
+
+# Common availability per (guild_id, team_key).
+# Invalidated by availability changes, roster changes and the daily cleanup.
+common_availability_cache = TeamCache(maxsize=1024)
+register(Gauge(
+    "zeri_common_availability_cache", "Common availability cache statistics (see TeamCache.stats).",
+    ("stat",), lambda: {(name,): value for name, value in common_availability_cache.stats().items()}))
+
+def get_common_availability(team_name, guild_id, conn):
+    """
+    Cached calculate_common_availability (same arguments and return shape).
+    Used by /voir_dispo, /planifier_session and the weekly recap.
+    """
+    key = (guild_id, team_key(team_name))
+    hit, value = common_availability_cache.get(key)
+    if hit:
+        if value is None:
+            return None
+        return {day: list(slots) for day, slots in value.items()}
+
+    generation = value
+    member_ids, schedule = _compute_common_availability(team_name, guild_id, conn)
+    if member_ids is None:
+        # Unknown team: cached too, add_player invalidates the key
+        common_availability_cache.put(key, None, (), generation)
         return None
-        
-    member_ids = [m[0] for m in members]
-    total_members = len(member_ids)
-    
-    # 2. Fetch ALL availability for these members in one query
-    # Note: Availability is GLOBAL, so we query by discord_id regardless of guild
-    placeholders = ','.join('?' for _ in member_ids)
-    query = f"""
-        SELECT discord_id, day, start_time, end_time 
-        FROM availability 
-        WHERE discord_id IN ({placeholders})
-        ORDER BY day
+
+    common_availability_cache.put(key, schedule, member_ids, generation)
+    return {day: list(slots) for day, slots in schedule.items()}
+
+def count_available_members(masks):
     """
-    cursor.execute(query, member_ids)
-    all_rows = cursor.fetchall()
+    Counts, for each hour of the week, how many masks have it free.
 
-    # Organize data: schedule[day][member_id] = [(start, end), ...]
-    # Initialize structure for all 7 days
-    full_schedule = {day: {mid: [] for mid in member_ids} for day in range(7)}
-    
-    for row in all_rows:
-        uid, day, start, end = row
-        full_schedule[day][uid].append((start, end))
-    
-    common_schedule = {}
-    
-    # 3. Process each day
+    Returns:
+        array: 168 counters indexed by day * 24 + hour.
+    """
+    counts = array('H', [0]) * (7 * HOURS_PER_DAY)
+    for mask in masks:
+        # Visit set bits only
+        while mask:
+            lowest = mask & -mask
+            counts[lowest.bit_length() - 1] += 1
+            mask ^= lowest
+    return counts
+
+def find_quorum_slots(team_name, guild_id, min_members, conn):
+    """
+    Finds the slots where at least `min_members` members of a team are free,
+    using one counting pass over all members instead of pairwise intersections.
+
+    Args:
+        team_name: The name of the team.
+        guild_id: The ID of the guild (server).
+        min_members: Minimum number of available members (k).
+        conn: The database connection.
+
+    Returns:
+        tuple: (total_members, slots) where slots is a list of (day, start, end, count),
+        ranked by count (highest first) then chronologically.
+        Returns None if the team doesn't exist or is empty.
+    """
+    members = _fetch_team_members(team_name, guild_id, conn)
+    if not members:
+        return None
+
+    masks = get_availability_masks([m[0] for m in members], conn)
+    counts = count_available_members(masks.values())
+
+    slots = []
     for day in range(7):
-        day_data = full_schedule[day]
-        
-        # Check if any member has NO availability for this day
-        # If a member hasn't filled anything, common availability is impossible
-        missing_data = False
+        offset = day * HOURS_PER_DAY
+        hour = 0
+        while hour < HOURS_PER_DAY:
+            count = counts[offset + hour]
+            if count < min_members:
+                hour += 1
+                continue
+            # Extend the run while the headcount stays the same
+            end = hour + 1
+            while end < HOURS_PER_DAY and counts[offset + end] == count:
+                end += 1
+            slots.append((day, hour, end, count))
+            hour = end
+
+    slots.sort(key=lambda slot: (-slot[3], slot[0], slot[1]))
+    return len(members), slots
+
+def compute_all_schedules(guild_ids, conn):
+    """
+    Computes the common availability of every team in one pass:
+    one streaming query for players, one for availability, then bitset ANDs in memory.
+
+    Args:
+        guild_ids: Set of guilds to keep (others are skipped), or None for all.
+        conn: The database connection.
+
+    Returns:
+        tuple: ({guild_id: [(team_name, schedule), ...]}, stats) where schedule has the
+        calculate_common_availability shape and stats is {"teams", "players", "seconds"}.
+    """
+    started = time.perf_counter()
+    cursor = conn.cursor()
+
+    # 1. Teams: (guild_id, team_key) -> [display name, member ids]
+    teams = {}
+    needed = set()
+    cursor.execute("SELECT guild_id, team_key, team, discord_id FROM players")
+    for guild_id, key, team, discord_id in cursor:
+        if guild_ids is not None and guild_id not in guild_ids:
+            continue
+        entry = teams.get((guild_id, key))
+        if entry is None:
+            entry = teams[(guild_id, key)] = [team, []]
+        elif team < entry[0]:
+            entry[0] = team
+        entry[1].append(discord_id)
+        needed.add(discord_id)
+
+    # 2. Week masks of every needed player
+    masks = {}
+    cursor.execute("SELECT discord_id, day, start_time, end_time FROM availability")
+    for discord_id, day, start, end in cursor:
+        if discord_id in needed:
+            masks[discord_id] = masks.get(discord_id, 0) | slot_mask(day, start, end)
+
+    # 3. AND per team
+    schedules = {}
+    for (guild_id, _key), (team, member_ids) in sorted(teams.items()):
+        common = WEEK_MASK
         for mid in member_ids:
-            if not day_data[mid]:
-                missing_data = True
+            common &= masks.get(mid, 0)
+            if not common:
                 break
-        
-        if missing_data:
-            common_schedule[day] = [] 
+        schedules.setdefault(guild_id, []).append((team, mask_to_schedule(common)))
+
+    stats = {"teams": len(teams), "players": len(needed), "seconds": time.perf_counter() - started}
+    return schedules, stats
+
+def merge_intervals(slots):
+    """
+    Returns the canonical form of a list of slots: sorted, with overlapping
+    or touching slots merged ((18, 20) + (20, 22) -> (18, 22)).
+    """
+    merged = []
+    for start, end in sorted(slots):
+        if start >= end:
             continue
-            
-        # 4. Calculate intersection
-        # Start with the first member's slots
-        first_member_slots = day_data[member_ids[0]]
-        current_common = first_member_slots
-        
-        # Intersect with subsequent members
-        for i in range(1, total_members):
-            next_member_slots = day_data[member_ids[i]]
-            current_common = intersect_intervals(current_common, next_member_slots)
-            
-            if not current_common:
-                break
-        
-        common_schedule[day] = current_common
-        
-    return common_schedule
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
 
-def intersect_intervals(slots_a, slots_b):
+def add_interval(slots, start, end):
     """
-    Finds the intersection between two lists of time slots.
-    Slots are tuples (start, end).
+    Adds (start, end) to canonical slots (see merge_intervals) in one pass.
     """
-    intersections = []
-    for start_a, end_a in slots_a:
-        for start_b, end_b in slots_b:
-            # Max of starts, Min of ends
-            low = max(start_a, start_b)
-            high = min(end_a, end_b)
-            
-            if low < high:
-                intersections.append((low, high))
-    return intersections
+    result = []
+    i = 0
+    while i < len(slots) and slots[i][1] < start:
+        result.append(slots[i])
+        i += 1
+    # Absorb every slot overlapping or touching the new one
+    while i < len(slots) and slots[i][0] <= end:
+        start = min(start, slots[i][0])
+        end = max(end, slots[i][1])
+        i += 1
+    result.append((start, end))
+    result.extend(slots[i:])
+    return result
+
+def subtract_interval(slots, start, end):
+    """
+    Removes the hours (start, end) from canonical slots in one pass (a slot may be split).
+    """
+    result = []
+    for slot_start, slot_end in slots:
+        if slot_end <= start or slot_start >= end:
+            result.append((slot_start, slot_end))
+            continue
+        if slot_start < start:
+            result.append((slot_start, start))
+        if slot_end > end:
+            result.append((end, slot_end))
+    return result
 
 def get_player_availability(discord_id, conn):
     """
@@ -104,7 +304,7 @@ def get_player_availability(discord_id, conn):
     common_schedule = {}
     
     # Optimization: Fetch all days in one query
-    cursor.execute("SELECT day, start_time, end_time FROM availability WHERE discord_id = ? ORDER BY day", (discord_id,))
+    cursor.execute("SELECT day, start_time, end_time FROM availability WHERE discord_id = ? ORDER BY day, start_time", (discord_id,))
     rows = cursor.fetchall()
     
     # Initialize all days empty
@@ -115,3 +315,11 @@ def get_player_availability(discord_id, conn):
         common_schedule[day].append((start, end))
         
     return common_schedule
+
+def is_registered_anywhere(discord_id, conn):
+    """
+    Checks if a user is registered in at least one guild.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM players WHERE discord_id = ?", (discord_id,))
+    return cursor.fetchone() is not None
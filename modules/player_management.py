@@ -1,6 +1,7 @@
 #------------------------------------------------------
 #           Imports
 #------------------------------------------------------
+import re
 import sqlite3
 import discord
 
@@ -9,8 +10,169 @@ import discord
 #------------------------------------------------------
 
 from modules.utils import check_permission_and_respond
+from modules.database import run_read
+from modules.write_behind import write_queue
+from modules.changes import CHANGE_MEMBER, CHANGE_TEAM, record_change
+from modules.planning import team_key, common_availability_cache, merge_intervals, add_interval, subtract_interval
 
-async def add_player(interaction, member, game, team, conn):
+DAYS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+# "18-22", "18h-22h", "18h - 22h"
+_SLOT_RE = re.compile(r"^(\d{1,2})h?\s*-\s*(\d{1,2})h?$")
+
+def _insert_player(discord_id, guild_id, username, game, team, conn):
+    """
+    Inserts a player row (write-behind: runs in a queued batch, no commit).
+    """
+    cursor = conn.cursor()
+    query = """
+        INSERT OR IGNORE INTO players (discord_id, guild_id, username, game, team, team_key)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    cursor.execute(query, (discord_id, guild_id, username, game, team, team_key(team)))
+    if cursor.rowcount > 0:
+        record_change(CHANGE_TEAM, guild_id, team_key(team), conn)
+
+def _delete_player(discord_id, guild_id, conn):
+    """
+    Deletes a player row for one guild (write-behind: runs in a queued batch, no commit).
+    Returns True if a row was deleted.
+    """
+    cursor = conn.cursor()
+    # Only remove from THIS guild
+    query = "DELETE FROM players WHERE discord_id = ? AND guild_id = ?"
+    cursor.execute(query, (discord_id, guild_id))
+    player_deleted = cursor.rowcount > 0
+    if player_deleted:
+        record_change(CHANGE_MEMBER, guild_id, discord_id, conn)
+
+    # Note: We DO NOT remove availability because it is GLOBAL.
+    # Unless the user is not in ANY guild anymore? 
+    # For simplicity (V2.0 plan), we keep availability global and persistent.
+
+    return player_deleted
+
+def _is_registered(discord_id, guild_id, conn):
+    """
+    Checks if a user is registered in a team of the guild (runs on a reader thread).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM players WHERE discord_id = ? AND guild_id = ?", (discord_id, guild_id))
+    return cursor.fetchone() is not None
+
+def _fetch_day_slots(discord_id, day, conn):
+    """
+    Returns the canonical slots of a user for one day (runs inside a write batch).
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT start_time, end_time FROM availability WHERE discord_id = ? AND day = ? ORDER BY start_time",
+        (discord_id, day)
+    )
+    return cursor.fetchall()
+
+def _write_day_slots(discord_id, day, slots, conn):
+    """
+    Replaces the rows of one user day by canonical slots (no commit).
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM availability WHERE discord_id = ? AND day = ?", (discord_id, day))
+    cursor.executemany(
+        "INSERT INTO availability (discord_id, day, start_time, end_time) VALUES (?, ?, ?, ?)",
+        [(discord_id, day, start, end) for start, end in slots]
+    )
+    record_change(CHANGE_MEMBER, None, discord_id, conn)
+
+def _add_slot(discord_id, day, start_time, end_time, conn):
+    """
+    Adds a slot to a user day, merged with the existing ones (write-behind, no commit).
+    Returns the resulting slots of the day.
+    """
+    slots = add_interval(_fetch_day_slots(discord_id, day, conn), start_time, end_time)
+    _write_day_slots(discord_id, day, slots, conn)
+    return slots
+
+def _remove_slot(discord_id, day, start_time, end_time, conn):
+    """
+    Removes hours from a user day, splitting slots if needed (write-behind, no commit).
+    Returns (changed, resulting slots of the day).
+    """
+    before = _fetch_day_slots(discord_id, day, conn)
+    slots = subtract_interval(before, start_time, end_time)
+    if slots == before:
+        return False, slots
+    _write_day_slots(discord_id, day, slots, conn)
+    return True, slots
+
+def _replace_week_availability(discord_id, week, conn):
+    """
+    Replaces the availability of a user for several days at once (write-behind, no commit).
+    Runs in its own savepoint: all the days are replaced, or none. Slots must be canonical.
+
+    Args:
+        discord_id: The user.
+        week: {day: [(start, end), ...]} - an empty list clears the day.
+    """
+    cursor = conn.cursor()
+    cursor.executemany(
+        "DELETE FROM availability WHERE discord_id = ? AND day = ?",
+        [(discord_id, day) for day in week]
+    )
+    cursor.executemany(
+        "INSERT INTO availability (discord_id, day, start_time, end_time) VALUES (?, ?, ?, ?)",
+        [(discord_id, day, start, end) for day, slots in week.items() for start, end in slots]
+    )
+    record_change(CHANGE_MEMBER, None, discord_id, conn)
+
+def parse_week_availability(text):
+    """
+    Parses and validates a week of availability, without touching the database.
+
+    Format: days separated by ";" or new lines, slots by ",":
+    "Lundi 18-22, 14h-16h; Mardi 20-23; Dimanche -" ("-" clears the day).
+    Day names may be abbreviated ("lun", "mer") and are accent/case insensitive.
+
+    Args:
+        text: The user input.
+
+    Returns:
+        dict: {day (0-6): [(start, end), ...]} sorted and merged.
+
+    Raises:
+        ValueError: With a message for the user.
+    """
+    week = {}
+    keys = [team_key(day) for day in DAYS]
+    for chunk in re.split(r"[;\n]", text):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        day_word, _, slots_text = chunk.partition(" ")
+        day_word = team_key(day_word.rstrip(":"))
+        matches = [i for i, key in enumerate(keys) if len(day_word) >= 3 and key.startswith(day_word)]
+        if len(matches) != 1:
+            raise ValueError(f"Jour invalide : « {chunk.split()[0]} ».")
+        day = matches[0]
+
+        slots = week.setdefault(day, [])
+        slots_text = slots_text.strip().lstrip(":").strip()
+        if slots_text in ("", "-", "aucun", "aucune"):
+            continue
+        for slot in slots_text.split(","):
+            match = _SLOT_RE.match(slot.strip().lower())
+            if not match:
+                raise ValueError(f"Créneau invalide pour {DAYS[day]} : « {slot.strip()} » (format : 18-22).")
+            start, end = int(match.group(1)), int(match.group(2))
+            if not (0 <= start <= 23) or not (0 <= end <= 23):
+                raise ValueError(f"{DAYS[day]} : les heures doivent être comprises entre 0 et 23.")
+            if start >= end:
+                raise ValueError(f"{DAYS[day]} : l'heure de début doit être avant l'heure de fin ({start}-{end}).")
+            slots.append((start, end))
+
+    if not week:
+        raise ValueError("Aucun jour indiqué (ex : « Lundi 18-22; Mardi 20-23 »).")
+    return {day: merge_intervals(slots) for day, slots in week.items()}
+
+async def add_player(interaction, member, game, team):
     """
     Adds a player to the database for the specific guild.
     
@@ -19,7 +181,6 @@ async def add_player(interaction, member, game, team, conn):
         member: The Discord member to add.
         game: The game the player plays.
         team: The team the player belongs to.
-        conn: The database connection.
     """
     if not await check_permission_and_respond(interaction):
         return
@@ -29,15 +190,14 @@ async def add_player(interaction, member, game, team, conn):
          return
 
     try:
-        cursor = conn.cursor()
-        query = """
-            INSERT OR IGNORE INTO players (discord_id, guild_id, username, game, team)
-            VALUES (?, ?, ?, ?, ?)
-        """
         # Lowercase team name for consistency within guild
-        cursor.execute(query, (member.id, interaction.guild_id, member.name, game, team.strip().lower()))
-        conn.commit()
-        print(f"Success: {member.name} added to DB (Guild {interaction.guild_id}).")
+        # Write-behind: acknowledged now, committed with the next batch
+        guild_id = interaction.guild_id
+        write_queue.submit(
+            member.id, _insert_player, member.id, guild_id, member.name, game, team.strip().lower(),
+            on_commit=lambda _: common_availability_cache.invalidate_key((guild_id, team_key(team)))
+        )
+        print(f"Success: {member.name} queued for DB (Guild {guild_id}).")
     except Exception as e:
         print(f"Error in add_player: {e}")
         try:
@@ -49,14 +209,13 @@ async def add_player(interaction, member, game, team, conn):
         except Exception:
             pass
 
-async def remove_player(interaction, member, conn):
+async def remove_player(interaction, member):
     """
     Removes a player from the database for the specific guild.
     
     Args:
         interaction: The Discord interaction object.
         member: The Discord member to remove.
-        conn: The database connection.
     """
     if not await check_permission_and_respond(interaction):
         return
@@ -66,18 +225,16 @@ async def remove_player(interaction, member, conn):
          return
 
     try:
-        cursor = conn.cursor()
-        # Only remove from THIS guild
-        query = "DELETE FROM players WHERE discord_id = ? AND guild_id = ?"
-        cursor.execute(query, (member.id, interaction.guild_id))
-        player_deleted = cursor.rowcount > 0
-
-        # Note: We DO NOT remove availability because it is GLOBAL.
-        # Unless the user is not in ANY guild anymore? 
-        # For simplicity (V2.0 plan), we keep availability global and persistent.
-        
-        conn.commit()
-        
+        # Read-your-writes: pending writes of this member first
+        guild_id = interaction.guild_id
+        await write_queue.flushed(member.id)
+        player_deleted = await run_read(_is_registered, member.id, guild_id)
+        if player_deleted:
+            write_queue.submit(
+                member.id, _delete_player, member.id, guild_id,
+                on_commit=lambda _: common_availability_cache.invalidate_member(member.id, guild_id)
+            )
+
         msg = ""
         if player_deleted:
             print(f"Success: {member.name} removed from DB (Guild {interaction.guild_id}).")
@@ -102,9 +259,9 @@ async def remove_player(interaction, member, conn):
         except Exception:
             pass
 
-async def add_availability(interaction, member, day, start_time, end_time, conn):
+async def add_availability(interaction, member, day, start_time, end_time):
     """
-    Adds player availability to the database (Global).
+    Adds a slot to the player availability (Global), merged with the other slots of the day.
     
     Args:
         interaction: The Discord interaction object.
@@ -112,11 +269,8 @@ async def add_availability(interaction, member, day, start_time, end_time, conn)
         day: Day of the week (0-6).
         start_time: Start hour (0-23).
         end_time: End hour (0-23).
-        conn: The database connection.
     """
     try:
-        cursor = conn.cursor()
-
         # Check if player exists in AT LEAST ONE guild (optional validation?)
         # Or just let them add availability even if not in a team yet?
         # Let's check if they are in THIS guild to be polite, or just allow it.
@@ -125,9 +279,10 @@ async def add_availability(interaction, member, day, start_time, end_time, conn)
         
         # New Validation: Check if user is in 'players' table (ignoring guild for now, or check current guild?)
         # If we check current guild, then a user must be added to team first. That makes sense.
+        # Read-your-writes: a pending /ajouter of this member is committed first
+        await write_queue.flushed(member.id)
         if interaction.guild_id:
-             cursor.execute("SELECT 1 FROM players WHERE discord_id = ? AND guild_id = ?", (member.id, interaction.guild_id))
-             if cursor.fetchone() is None:
+             if not await run_read(_is_registered, member.id, interaction.guild_id):
                 # Fallback: Check if they are in ANY guild? 
                 # If they are not in this guild, they shouldn't be managing stuff here maybe?
                 # But availability is global... 
@@ -140,18 +295,14 @@ async def add_availability(interaction, member, day, start_time, end_time, conn)
                      await interaction.followup.send(msg, ephemeral=True)
                 return
         
-        # Check for existing availability. 
-        cursor.execute("DELETE FROM availability WHERE discord_id = ? AND day = ?", (member.id, day))
-        
-        query = """
-            INSERT INTO availability (discord_id, day, start_time, end_time)
-            VALUES (?, ?, ?, ?)
-        """
-        cursor.execute(query, (member.id, day, start_time, end_time))
-        conn.commit()
-        print(f"Success: Availability added for {member.name} on day {day}.")
+        # Availability is global: every cached team of this user, in every guild
+        write_queue.submit(
+            member.id, _add_slot, member.id, day, start_time, end_time,
+            on_commit=lambda _: common_availability_cache.invalidate_member(member.id)
+        )
+        print(f"Success: Availability queued for {member.name} on day {day}.")
         
-        msg = f"Disponibilité ajoutée pour {member.name} (Global) !"
+        msg = f"Disponibilité ajoutée pour {member.name} (Global) ! {DAYS[day]} : {start_time}h-{end_time}h"
         if not interaction.response.is_done():
             await interaction.response.send_message(msg, ephemeral=True)
         else:
@@ -167,3 +318,90 @@ async def add_availability(interaction, member, day, start_time, end_time, conn)
                 await interaction.followup.send(msg, ephemeral=True)
         except Exception:
             pass
+
+async def remove_availability(interaction, member, day, start_time, end_time):
+    """
+    Removes hours from the player availability (Global); a slot may be split in two.
+    
+    Args:
+        interaction: The Discord interaction object.
+        member: The Discord member.
+        day: Day of the week (0-6).
+        start_time: Start hour (0-23).
+        end_time: End hour (0-23).
+    """
+    try:
+        # The reply needs the result: wait for the batch (still one shared commit)
+        changed, slots = await write_queue.submit(member.id, _remove_slot, member.id, day, start_time, end_time)
+        if changed:
+            common_availability_cache.invalidate_member(member.id)
+            print(f"Success: Availability removed for {member.name} on day {day}.")
+            slots_str = ", ".join(f"{start}h-{end}h" for start, end in slots) or "aucune"
+            msg = f"Disponibilité retirée pour {member.name} (Global). {DAYS[day]} : {slots_str}"
+        else:
+            msg = f"Aucune disponibilité de {member.name} sur ce créneau."
+
+        if not interaction.response.is_done():
+            await interaction.response.send_message(msg, ephemeral=True)
+        else:
+            await interaction.followup.send(msg, ephemeral=True)
+
+    except Exception as e:
+        print(f"Error in remove_availability: {e}")
+        try:
+            msg = "Échec du retrait de la disponibilité. Veuillez réessayer."
+            if not interaction.response.is_done():
+                await interaction.response.send_message(msg, ephemeral=True)
+            else:
+                await interaction.followup.send(msg, ephemeral=True)
+        except Exception:
+            pass
+
+async def add_week_availability(interaction, member, week):
+    """
+    Replaces the player availability for several days in one write (Global).
+    
+    Args:
+        interaction: The Discord interaction object.
+        member: The Discord member.
+        week: {day: [(start, end), ...]} as returned by parse_week_availability.
+    """
+    try:
+        # Same rule as add_availability: registered in a team of this guild
+        await write_queue.flushed(member.id)
+        if interaction.guild_id:
+            if not await run_read(_is_registered, member.id, interaction.guild_id):
+                msg = "Erreur : Vous n'êtes pas enregistré dans une équipe sur ce serveur."
+                if not interaction.response.is_done():
+                    await interaction.response.send_message(msg, ephemeral=True)
+                else:
+                    await interaction.followup.send(msg, ephemeral=True)
+                return
+
+        # Once for the whole week
+        write_queue.submit(
+            member.id, _replace_week_availability, member.id, week,
+            on_commit=lambda _: common_availability_cache.invalidate_member(member.id)
+        )
+        print(f"Success: Availability queued for {member.name} on {len(week)} day(s).")
+
+        lines = []
+        for day, slots in sorted(week.items()):
+            slots_str = ", ".join(f"{start}h-{end}h" for start, end in slots) or "aucune"
+            lines.append(f"• {DAYS[day]} : {slots_str}")
+        msg = f"Disponibilités mises à jour pour {member.name} (Global) :\n" + "\n".join(lines)
+        if not interaction.response.is_done():
+            await interaction.response.send_message(msg, ephemeral=True)
+        else:
+            await interaction.followup.send(msg, ephemeral=True)
+
+    except Exception as e:
+        print(f"Error in add_week_availability: {e}")
+        try:
+            msg = "Échec de l'ajout des disponibilités. Veuillez réessayer."
+            if not interaction.response.is_done():
+                await interaction.response.send_message(msg, ephemeral=True)
+            else:
+                await interaction.followup.send(msg, ephemeral=True)
+        except Exception:
+            pass
@@ -0,0 +1,263 @@
+#------------------------------------------------------
+#           Imports
+#------------------------------------------------------
+import asyncio
+import heapq
+import time
+
+import discord
+
+from modules.config import get_guild_config
+from modules.database import run_read, run_write, transaction
+from modules.dispatch import RateLimiter, send_with_retry
+from modules.metrics import Gauge, register
+from modules.planning import team_key
+from modules.sharding import owns_guild
+from modules.changes import CHANGE_SESSION, record_change
+
+#------------------------------------------------------
+#           Configuration
+#------------------------------------------------------
+# Reminders are posted this long before the session starts
+SESSION_REMINDER_SECONDS = 3600
+# Reminders falling due together (sessions at the same hour) are posted under this rate
+REMINDER_POST_RATE_PER_SECOND = 20
+# Discord message length limit: mentions of large teams are split over several messages
+MESSAGE_MAX_LENGTH = 2000
+# Cancelled entries stay in the heap until popped; it is rebuilt when they outnumber live ones
+HEAP_COMPACT_MIN = 64
+
+#------------------------------------------------------
+#           Database Helpers
+#------------------------------------------------------
+def _fetch_pending_reminders(now_ts, conn):
+    """
+    Returns (id, guild_id, team, date, time, start_ts) of upcoming sessions not reminded yet
+    (runs on a reader thread). Answered by idx_sessions_reminder_pending.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, guild_id, team, date, time, start_ts FROM sessions
+        WHERE reminder_sent = 0 AND start_ts > ?
+    """, (now_ts,))
+    return cursor.fetchall()
+
+def _fetch_pending_reminder(session_id, conn):
+    """
+    Returns (id, guild_id, team, date, time, start_ts) of one session if its reminder
+    is still to send, or None (runs on a reader thread).
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, guild_id, team, date, time, start_ts FROM sessions WHERE id = ? AND reminder_sent = 0",
+        (session_id,)
+    )
+    return cursor.fetchone()
+
+def _claim_reminder(session_id, guild_id, conn):
+    """
+    Flags the reminder of a session as sent (runs on the writer thread).
+    Returns False if the session was deleted or already reminded (restart, other process).
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+        cursor.execute("UPDATE sessions SET reminder_sent = 1 WHERE id = ? AND reminder_sent = 0", (session_id,))
+        if cursor.rowcount == 0:
+            return False
+        record_change(CHANGE_SESSION, guild_id, session_id, conn)
+        return True
+
+def _release_reminder(session_id, guild_id, conn):
+    """
+    Clears the sent flag of a reminder that could not be posted (runs on the writer thread),
+    so a restart or another process retries it.
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+        cursor.execute("UPDATE sessions SET reminder_sent = 0 WHERE id = ?", (session_id,))
+        record_change(CHANGE_SESSION, guild_id, session_id, conn)
+
+def _fetch_team_player_ids(guild_id, team, conn):
+    """
+    Returns the Discord IDs of the players of a team (runs on a reader thread).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT discord_id FROM players WHERE guild_id = ? AND team_key = ?", (guild_id, team_key(team)))
+    return [discord_id for (discord_id,) in cursor.fetchall()]
+
+def _mention_chunks(player_ids):
+    """
+    Splits the mentions of a team into message contents under MESSAGE_MAX_LENGTH.
+    """
+    chunks, current = [], ""
+    for player_id in player_ids:
+        mention = f"<@{player_id}>"
+        if current and len(current) + 1 + len(mention) > MESSAGE_MAX_LENGTH:
+            chunks.append(current)
+            current = mention
+        else:
+            current = f"{current} {mention}" if current else mention
+    if current:
+        chunks.append(current)
+    return chunks
+
+#------------------------------------------------------
+#           Scheduler
+#------------------------------------------------------
+class SessionReminderScheduler:
+    """
+    Posts a reminder in the guild's reminder channel before each planned session.
+
+    Upcoming sessions sit in a min-heap keyed on reminder time; one task sleeps until
+    the top is due. schedule_session/delete_session call add()/cancel(), which wake the
+    task only when the next due reminder changes. Each session costs O(log n); pending
+    reminders are read once at startup, then sessions changed by other processes are
+    refreshed one by one (see refresh).
+    """
+
+    def __init__(self, lead_seconds=SESSION_REMINDER_SECONDS):
+        self.lead_seconds = lead_seconds
+        self._heap = []         # (remind_at, session_id)
+        self._sessions = {}     # session_id -> (remind_at, guild_id, team, date, time)
+        self._wakeup = None     # asyncio.Event, created on the running loop
+        self._task = None
+        self._sending = set()
+        self._limiter = RateLimiter(REMINDER_POST_RATE_PER_SECOND)
+        self.bot = None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def start(self, bot):
+        """
+        Loads the upcoming sessions of the guilds owned by this process and starts
+        the scheduler task. Safe to call again (on_ready runs on every reconnect).
+        """
+        if self._task is not None and not self._task.done():
+            return
+        self.bot = bot
+        self._wakeup = asyncio.Event()
+        rows = await run_read(_fetch_pending_reminders, int(time.time()))
+        for session_id, guild_id, team, date, time_display, start_ts in rows:
+            if owns_guild(bot, guild_id):
+                self._sessions[session_id] = (start_ts - self.lead_seconds, guild_id, team, date, time_display)
+        # Bulk load: heapify is O(n)
+        self._heap = [(session[0], session_id) for session_id, session in self._sessions.items()]
+        heapq.heapify(self._heap)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        print(f"Session reminder scheduler started ({len(self._sessions)} upcoming sessions).")
+
+    async def refresh(self, session_id):
+        """
+        Re-reads one session changed by another process (scheduled, deleted or
+        reminded there) and adds or drops its reminder. O(log n), see external_writes_watch.
+        """
+        if self._task is None:
+            return
+        row = await run_read(_fetch_pending_reminder, session_id)
+        if row is None or row[5] <= time.time() or not owns_guild(self.bot, row[1]):
+            self.cancel(session_id)
+            return
+        known = self._sessions.get(session_id)
+        if known is None or known[0] != row[5] - self.lead_seconds:
+            self.add(*row)
+
+    def add(self, session_id, guild_id, team, date, time_display, start_ts):
+        """
+        Schedules the reminder of a new session.
+        """
+        remind_at = start_ts - self.lead_seconds
+        self._sessions[session_id] = (remind_at, guild_id, team, date, time_display)
+        heapq.heappush(self._heap, (remind_at, session_id))
+        # Only an earlier next reminder changes how long the task sleeps
+        if self._heap[0][1] == session_id and self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self, session_id):
+        """
+        Drops the reminder of a deleted session. Its heap entry is skipped when popped.
+        """
+        if self._sessions.pop(session_id, None) is None:
+            return
+        if len(self._heap) > max(HEAP_COMPACT_MIN, 2 * len(self._sessions)):
+            self._heap = [entry for entry in self._heap if self._is_live(entry)]
+            heapq.heapify(self._heap)
+
+    def _is_live(self, entry):
+        remind_at, session_id = entry
+        session = self._sessions.get(session_id)
+        return session is not None and session[0] == remind_at
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            while self._heap and not self._is_live(self._heap[0]):
+                heapq.heappop(self._heap)
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            remind_at, session_id = self._heap[0]
+            delay = remind_at - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            session = self._sessions.pop(session_id)
+            task = asyncio.create_task(self._send(session_id, *session[1:]))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, session_id, guild_id, team, date, time_display):
+        try:
+            config = get_guild_config(guild_id) or {}
+            channel_id = config.get("reminder_channel_id") or config.get("default_channel_id")
+            if not channel_id:
+                return # No channel configured for this guild
+            channel = self.bot.get_channel(channel_id)
+            if not channel:
+                print(f"Channel {channel_id} not found for guild {guild_id}.")
+                return
+
+            # At most once, even across restarts and processes
+            if not await run_write(_claim_reminder, session_id, guild_id):
+                return
+        except Exception as e:
+            print(f"Error sending reminder of session {session_id}: {e}")
+            return
+
+        posted = False
+        try:
+            player_ids = await run_read(_fetch_team_player_ids, guild_id, team)
+            embed = discord.Embed(
+                title=f"⏰ Rappel de session - {team.title()}",
+                description=f"📅 **Date** : {date}\n🕒 **Heure** : {time_display}\n\nLa session commence bientôt !",
+                color=discord.Color.blue()
+            )
+            chunks = _mention_chunks(player_ids) or [None]
+            for i, content in enumerate(chunks):
+                await self._limiter.acquire()
+                if i == 0:
+                    await send_with_retry(lambda: channel.send(content=content, embed=embed))
+                    posted = True
+                else:
+                    await send_with_retry(lambda: channel.send(content=content))
+        except Exception as e:
+            if posted:
+                # The reminder is out, only some mentions are missing: not posted again
+                print(f"Error sending mentions of session {session_id}: {e}")
+                return
+            print(f"Error sending reminder of session {session_id}: {e}")
+            try:
+                await run_write(_release_reminder, session_id, guild_id)
+            except Exception as e:
+                print(f"Error releasing reminder of session {session_id}: {e}")
+
+session_reminders = SessionReminderScheduler()
+register(Gauge(
+    "zeri_session_reminders_scheduled", "Session reminders waiting in the scheduler heap.",
+    (), lambda: {(): len(session_reminders)}))
@@ -1,18 +1,124 @@
 import sqlite3
 import datetime
 import discord
-import re
-from modules.planning import calculate_common_availability
+from modules.planning import get_common_availability, team_key
 
 from modules.utils import check_permission_and_respond
+from modules.database import run_read, run_write, transaction
+from modules.reminders import session_reminders
+from modules.changes import CHANGE_SESSION, record_change
 
-async def schedule_session(interaction, team, day_input, start_hour, end_hour, conn):
+# Max sessions shown by /liste_sessions
+UPCOMING_SESSIONS_LIMIT = 15
+
+# Upper bound of a session length (sessions fit in one day). Overlap queries only
+# scan sessions starting in [start - MAX_SESSION_SECONDS, end) on idx_sessions_upcoming,
+# so their cost does not grow with the session history.
+MAX_SESSION_SECONDS = 24 * 3600
+# Conflicts listed in a reply
+CONFLICTS_SHOWN = 5
+
+def _team_exists(team, guild_id, conn):
     """
-    Schedules a session for a team in the current guild.
+    Checks if a team has at least one player in the guild (runs on a reader thread).
     """
-    if not await check_permission_and_respond(interaction):
-        return
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM players WHERE guild_id = ? AND team_key = ?", (guild_id, team_key(team)))
+    return cursor.fetchone() is not None
 
+def _fetch_team_conflicts(team, guild_id, start_ts, end_ts, conn):
+    """
+    Returns (id, date, time) of the team sessions overlapping [start_ts, end_ts).
+    Bounded range scan on idx_sessions_upcoming (see MAX_SESSION_SECONDS).
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, date, time FROM sessions
+        WHERE guild_id = ? AND team_key = ?
+          AND start_ts > ? AND start_ts < ? AND end_ts > ?
+        ORDER BY start_ts
+    """, (guild_id, team_key(team), start_ts - MAX_SESSION_SECONDS, end_ts, start_ts))
+    return cursor.fetchall()
+
+def _fetch_player_conflicts(team, guild_id, start_ts, end_ts, conn):
+    """
+    Returns (username, guild_id, team, date, time) for players of the team who already
+    have an overlapping session with another team, in any guild (runs on a reader thread).
+    Per member: primary key lookup of their other teams, then the same bounded range scan.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.username, s.guild_id, s.team, s.date, s.time
+        FROM players p
+        JOIN players other ON other.discord_id = p.discord_id
+            AND NOT (other.guild_id = p.guild_id AND other.team_key = p.team_key)
+        JOIN sessions s ON s.guild_id = other.guild_id AND s.team_key = other.team_key
+            AND s.start_ts > ? AND s.start_ts < ? AND s.end_ts > ?
+        WHERE p.guild_id = ? AND p.team_key = ?
+        ORDER BY p.username, s.start_ts
+    """, (start_ts - MAX_SESSION_SECONDS, end_ts, start_ts, guild_id, team_key(team)))
+    return cursor.fetchall()
+
+def _insert_session(guild_id, team, date_str, time_display, start_ts, end_ts, conn):
+    """
+    Inserts a session row unless the team already has an overlapping session (runs on the writer thread).
+    Check and insert are one unit of work, so two concurrent requests cannot both pass.
+
+    Returns:
+        tuple: (new session ID or None, conflicting sessions).
+    """
+    with transaction(conn):
+        conflicts = _fetch_team_conflicts(team, guild_id, start_ts, end_ts, conn)
+        if conflicts:
+            return None, conflicts
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO sessions (guild_id, team, team_key, date, time, start_ts, end_ts) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (guild_id, team, team_key(team), date_str, time_display, start_ts, end_ts)
+        )
+        session_id = cursor.lastrowid
+        record_change(CHANGE_SESSION, guild_id, session_id, conn)
+    return session_id, []
+
+def _fetch_upcoming_sessions(team, guild_id, now_ts, limit, conn):
+    """
+    Returns the next `limit` sessions of a team starting at or after now_ts (runs on a reader thread).
+    Range scan on idx_sessions_upcoming: cost does not depend on past sessions.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, date, time FROM sessions
+        WHERE guild_id = ? AND team_key = ? AND start_ts >= ?
+        ORDER BY start_ts
+        LIMIT ?
+    """, (guild_id, team_key(team), now_ts, limit))
+    return cursor.fetchall()
+
+def _fetch_session(session_id, conn):
+    """
+    Returns (team, date, time) of a session, or None (runs on a reader thread).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT team, date, time FROM sessions WHERE id = ?", (session_id,))
+    return cursor.fetchone()
+
+def _delete_session_row(session_id, conn):
+    """
+    Deletes a session row (runs on the writer thread).
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT guild_id FROM sessions WHERE id = ?", (session_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return
+        cursor.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        record_change(CHANGE_SESSION, row[0], session_id, conn)
+
+async def schedule_session(interaction, team, day_input, start_hour, end_hour):
+    """
+    Schedules a session for a team in the current guild.
+    """
     if not await check_permission_and_respond(interaction):
         return
 
@@ -20,9 +126,16 @@ async def schedule_session(interaction, team, day_input, start_hour, end_hour, c
          await interaction.response.send_message("Cette commande doit être utilisée sur un serveur.", ephemeral=True)
          return
 
-    cursor = conn.cursor()
     team = team.strip().lower()
 
+    # Sessions fit in their day: the overlap queries rely on it (MAX_SESSION_SECONDS)
+    if not (0 <= start_hour < end_hour <= 24):
+        await interaction.response.send_message(
+            "❌ Horaires invalides : l'heure de début doit être avant l'heure de fin, entre 0h et 24h.",
+            ephemeral=True
+        )
+        return
+
     # 1. Resolve Day Input to Date
     days_map = {
         "lundi": 0, "mardi": 1, "mercredi": 2, "jeudi": 3, 
@@ -48,10 +161,12 @@ async def schedule_session(interaction, team, day_input, start_hour, end_hour, c
              
     target_date = today + datetime.timedelta(days=days_ahead)
     date_str = target_date.strftime("%d/%m/%Y")
+    day_start = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_ts = int((day_start + datetime.timedelta(hours=start_hour)).timestamp())
+    end_ts = int((day_start + datetime.timedelta(hours=end_hour)).timestamp())
     
     # 2. Check if team exists IN THIS GUILD
-    cursor.execute("SELECT 1 FROM players WHERE LOWER(team) = ? AND guild_id = ?", (team, interaction.guild_id))
-    if cursor.fetchone() is None:
+    if not await run_read(_team_exists, team, interaction.guild_id):
         # Also check if it's a new team? But players must exist first.
         await interaction.response.send_message(f"⚠️ L'équipe **{team.title()}** n'existe pas sur ce serveur.", ephemeral=True)
         return
@@ -59,7 +174,7 @@ async def schedule_session(interaction, team, day_input, start_hour, end_hour, c
     # 3. Availability Check (Warning only)
     warning_message = ""
     # Pass guild_id to availability calculation
-    common_slots = calculate_common_availability(team, interaction.guild_id, conn)
+    common_slots = await run_read(get_common_availability, team, interaction.guild_id)
     
     # Check compatibility
     is_compatible = False
@@ -72,11 +187,29 @@ async def schedule_session(interaction, team, day_input, start_hour, end_hour, c
     if not is_compatible:
         warning_message = f"\n⚠️ **Attention** : Créneau ({day_input.title()} {start_hour}h-{end_hour}h) hors des disponibilités communes déclarées."
 
-    # 4. Insert into DB (with guild_id)
+    # 4. Players already booked with another team (any guild): warning only
+    player_conflicts = await run_read(_fetch_player_conflicts, team, interaction.guild_id, start_ts, end_ts)
+    if player_conflicts:
+        lines = [
+            f"• {username} : {other_team.title()}{'' if other_guild == interaction.guild_id else ' (autre serveur)'}, {date} {time}"
+            for username, other_guild, other_team, date, time in player_conflicts[:CONFLICTS_SHOWN]
+        ]
+        if len(player_conflicts) > CONFLICTS_SHOWN:
+            lines.append(f"• ... et {len(player_conflicts) - CONFLICTS_SHOWN} autre(s)")
+        warning_message += "\n⚠️ **Joueurs déjà pris** sur ce créneau :\n" + "\n".join(lines)
+
+    # 5. Insert into DB (with guild_id), rejected if the team is already booked
     try:
         time_display = f"{start_hour}h - {end_hour}h"
-        cursor.execute("INSERT INTO sessions (guild_id, team, date, time) VALUES (?, ?, ?, ?)", (interaction.guild_id, team, date_str, time_display))
-        conn.commit()
+        session_id, conflicts = await run_write(_insert_session, interaction.guild_id, team, date_str, time_display, start_ts, end_ts)
+        if conflicts:
+            lines = [f"• ID {conflict_id} : {date} {time}" for conflict_id, date, time in conflicts[:CONFLICTS_SHOWN]]
+            await interaction.response.send_message(
+                f"❌ L'équipe **{team.title()}** a déjà une session sur ce créneau :\n" + "\n".join(lines),
+                ephemeral=True
+            )
+            return
+        session_reminders.add(session_id, interaction.guild_id, team, date_str, time_display, start_ts)
         
         embed = discord.Embed(
             title=f"✅ Session planifiée - {team.title()}",
@@ -90,7 +223,7 @@ async def schedule_session(interaction, team, day_input, start_hour, end_hour, c
         await interaction.response.send_message("Erreur lors de la planification.", ephemeral=True)
 
 
-async def list_sessions(interaction, team, conn):
+async def list_sessions(interaction, team):
     """
     Lists upcoming sessions for a team in the current guild.
     """
@@ -98,14 +231,13 @@ async def list_sessions(interaction, team, conn):
          await interaction.response.send_message("Cette commande doit être utilisée sur un serveur.", ephemeral=True)
          return
 
-    cursor = conn.cursor()
     team = team.strip().lower()
     
-    cursor.execute("SELECT id, date, time FROM sessions WHERE LOWER(team) = ? AND guild_id = ?", (team, interaction.guild_id))
-    rows = cursor.fetchall()
+    now_ts = int(datetime.datetime.now().timestamp())
+    rows = await run_read(_fetch_upcoming_sessions, team, interaction.guild_id, now_ts, UPCOMING_SESSIONS_LIMIT)
     
     if not rows:
-        await interaction.response.send_message(f"Aucune session prévue pour l'équipe **{team.title()}**.", ephemeral=True)
+        await interaction.response.send_message(f"Aucune session à venir pour l'équipe **{team.title()}**.", ephemeral=True)
         return
         
     embed = discord.Embed(
@@ -114,51 +246,25 @@ async def list_sessions(interaction, team, conn):
     )
     
     sessions_txt = ""
-    parsed_rows = []
-    
-    for r in rows:
-        try:
-            dt_date = datetime.datetime.strptime(r[1], "%d/%m/%Y")
-            match = re.search(r"(\d+)", r[2])
-            start_hour = int(match.group(1)) if match else 0
-            dt = dt_date.replace(hour=start_hour, minute=0)
-            parsed_rows.append((dt, r))
-        except Exception as e:
-            print(f"Error parsing session row {r}: {e}")
-            continue
-            
-    parsed_rows.sort(key=lambda x: x[0])
-    
-    now = datetime.datetime.now()
-    
-    for dt, row in parsed_rows:
-        if dt < now:
-            continue
-        sessions_txt += f"• **{row[1]}** : {row[2]} (ID: {row[0]})\n"
-        
-    if not sessions_txt:
-        sessions_txt = "Aucune session à venir (anciennes sessions masquées)."
+    for session_id, date, time in rows:
+        sessions_txt += f"• **{date}** : {time} (ID: {session_id})\n"
         
     embed.description = sessions_txt
     await interaction.response.send_message(embed=embed)
 
-async def delete_session(interaction, session_id, conn):
+async def delete_session(interaction, session_id):
     """
     Deletes a session by ID.
     
     Args:
         interaction: Discord interaction.
         session_id (int): ID of the session to delete.
-        conn: Database connection.
     """
     if not await check_permission_and_respond(interaction):
         return
         
-    cursor = conn.cursor()
-    
     # Check if session exists
-    cursor.execute("SELECT team, date, time FROM sessions WHERE id = ?", (session_id,))
-    row = cursor.fetchone()
+    row = await run_read(_fetch_session, session_id)
     
     if not row:
         await interaction.response.send_message(f"❌ Aucune session trouvée avec l'ID **{session_id}**.", ephemeral=True)
@@ -167,8 +273,8 @@ async def delete_session(interaction, session_id, conn):
     team, date, time = row
     
     try:
-        cursor.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
-        conn.commit()
+        await run_write(_delete_session_row, session_id)
+        session_reminders.cancel(session_id)
         
         embed = discord.Embed(
             title="🗑️ Session supprimée",
@@ -0,0 +1,72 @@
+#------------------------------------------------------
+#           Shard Ownership
+#------------------------------------------------------
+# Several processes can run against the same database, each owning a range of
+# shards (SHARD_COUNT / SHARD_IDS in main.py). Background tasks use these helpers
+# so every guild is handled by exactly one process.
+
+def parse_shard_ids(value):
+    """
+    Parses a shard list such as "0-3,8" into [0, 1, 2, 3, 8].
+    """
+    shard_ids = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            shard_ids.update(range(int(first), int(last) + 1))
+        else:
+            shard_ids.add(int(part))
+    return sorted(shard_ids)
+
+def shard_for_guild(guild_id, shard_count):
+    """
+    Shard of a guild, as computed by Discord: (guild_id >> 22) % shard_count.
+    """
+    return (guild_id >> 22) % shard_count
+
+def owned_shards(bot):
+    """
+    Returns (shard_count, set of owned shard IDs), or None when the process sees every guild.
+    """
+    shard_count = getattr(bot, "shard_count", None) or 1
+    if shard_count <= 1:
+        return None
+    shard_ids = getattr(bot, "shard_ids", None)
+    if shard_ids is None:
+        # Plain Bot started with shard_id, or AutoShardedBot before launch
+        shard_id = getattr(bot, "shard_id", None)
+        shard_ids = [shard_id] if shard_id is not None else range(shard_count)
+    owned = set(shard_ids)
+    if len(owned) >= shard_count:
+        return None
+    return shard_count, owned
+
+def owns_guild(bot, guild_id):
+    """
+    True if the guild belongs to a shard of this process.
+    """
+    shards = owned_shards(bot)
+    if shards is None:
+        return True
+    shard_count, owned = shards
+    return shard_for_guild(guild_id, shard_count) in owned
+
+def owns_shard(bot, shard_id):
+    """
+    True if this process owns the given shard (e.g. shard 0 syncs the commands).
+    """
+    shards = owned_shards(bot)
+    return shards is None or shard_id in shards[1]
+
+def shard_scope(bot):
+    """
+    Label of the shards owned by this process ("all" or "4:0,1"), used to name per-shard jobs.
+    """
+    shards = owned_shards(bot)
+    if shards is None:
+        return "all"
+    shard_count, owned = shards
+    return f"{shard_count}:{','.join(map(str, sorted(owned)))}"
@@ -1,9 +1,34 @@
 import discord
 from discord.ext import tasks
 import datetime
+import functools
 import os
-from modules.database import conn
-from modules.planning import calculate_common_availability
+import time
+from modules.database import run_read, run_write, transaction
+from modules.planning import compute_all_schedules, common_availability_cache
+from modules.config import all_guild_configs, reload_guild_config
+from modules.reminders import session_reminders
+from modules.metrics import track_task
+from modules.sharding import owns_guild, shard_scope
+from modules.jobs import LEASE_SECONDS, OWNER, run_job, resume_unfinished_jobs
+from modules.changes import (CHANGE_AVAILABILITY, CHANGE_CONFIG, CHANGE_MEMBER, CHANGE_SESSION, CHANGE_TEAM,
+                             CHANGE_LOG_RETENTION_SECONDS, record_change, _fetch_changes, _last_change_id,
+                             _prune_changes)
+from modules.dispatch import RateLimiter, FanoutProgress, fan_out, post_by_channel, send_with_retry
+
+# Reminder DMs: each one costs up to 2 requests (DM channel + message)
+# against Discord's global limit of 50 requests/s.
+REMINDER_CONCURRENCY = 10
+REMINDER_RATE_PER_SECOND = 20
+
+# Weekly recap: channels posted to concurrently (each channel is sent in order)
+SCHEDULE_POST_CONCURRENCY = 10
+SCHEDULE_POST_RATE_PER_SECOND = 40
+
+# Other processes (other shards, standbys): how often to read their change log entries,
+# and how many entries per query
+EXTERNAL_WRITES_POLL_SECONDS = 5
+CHANGE_LOG_BATCH = 500
 
 def start_tasks(bot):
     """
@@ -16,6 +41,8 @@ def start_tasks(bot):
     daily_cleanup.bot = bot
     weekly_schedule.bot = bot
     availability_reminder.bot = bot
+    resume_jobs.bot = bot
+    external_writes_watch.bot = bot
 
     if not daily_cleanup.is_running():
         daily_cleanup.start()
@@ -29,23 +56,92 @@ def start_tasks(bot):
         availability_reminder.start()
         print("Availability reminder task started.")
 
+    if not resume_jobs.is_running():
+        resume_jobs.start()
+        print("Job failover task started.")
+
+    # Other processes may share the database: follow what they change (change log)
+    if not external_writes_watch.is_running():
+        external_writes_watch.start()
+        print("External writes watch started.")
+
+def _delete_day_availability(day, conn):
+    """
+    Deletes every availability row of a day (runs on the writer thread).
+    """
+    with transaction(conn):
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM availability WHERE day = ?", (day,))
+        record_change(CHANGE_AVAILABILITY, None, None, conn)
+
+def _fetch_players_without_availability(conn):
+    """
+    Returns (discord_id, username, guild_id) of players with no availability at all (runs on a reader thread).
+    guild_id is the lowest guild of the player: the process owning its shard sends the reminder.
+    """
+    cursor = conn.cursor()
+    # Anti-join: one row per user (users might be in multiple guilds),
+    # NOT EXISTS is answered by idx_availability_user_day
+    cursor.execute("""
+        SELECT p.discord_id, MIN(p.username), MIN(p.guild_id)
+        FROM players p
+        WHERE NOT EXISTS (SELECT 1 FROM availability a WHERE a.discord_id = p.discord_id)
+        GROUP BY p.discord_id
+    """)
+    return cursor.fetchall()
+
+def _day_period():
+    """
+    Period key of daily jobs ("2024-05-13").
+    """
+    return datetime.date.today().isoformat()
+
+def _week_period():
+    """
+    Period key of weekly jobs (ISO week, "2024-W20").
+    """
+    year, week, _ = datetime.date.today().isocalendar()
+    return f"{year}-W{week:02d}"
+
+def _job_name(bot, job):
+    """
+    Lease name of a per-shard job: processes owning other shards run their own.
+    """
+    return f"{job}@{shard_scope(bot)}"
+
+def _schedule_embed(team, schedule):
+    """
+    Builds the weekly recap embed of a team.
+    """
+    embed = discord.Embed(
+        title=f"📅 Emploi du temps - Équipe {team.title()}",
+        description="Voici les créneaux communs pour la semaine :",
+        color=discord.Color.green()
+    )
+    days_str = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+    
+    has_slots = False
+    for day_idx, slots in schedule.items():
+        if slots:
+            has_slots = True
+            slots_str = "\n".join([f"• {s[0]}h - {s[1]}h" for s in slots])
+            embed.add_field(name=days_str[day_idx], value=slots_str, inline=False)
+    
+    if not has_slots:
+        embed.description = "Pas de créneaux communs trouvés pour cette semaine."
+        embed.color = discord.Color.orange()
+    return embed
+
 @tasks.loop(time=datetime.time(hour=0, minute=0))
 async def daily_cleanup():
     """
     Cleans up the database every day at midnight.
     Deletes entries for the previous day.
     """
-    # Calculate yesterday's index
-    today = datetime.datetime.now()
-    yesterday_index = (today.weekday() - 1) % 7
-    days = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
-    previous_day_name = days[yesterday_index]
-    
     try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM availability WHERE day = ?", (yesterday_index,))
-        conn.commit()
-        print(f"Database cleaned for {previous_day_name}.")
+        # The process running the cleanup clears its cache; the others read
+        # its change log entry (external_writes_watch)
+        await run_daily_cleanup(_day_period())
         
         # Optional: Notify configured channels? 
         # For V2, we might just log it to console to avoid spamming channels daily.
@@ -55,6 +151,24 @@ async def daily_cleanup():
     except Exception as e:
         print(f"Error in daily_cleanup: {e}")
 
+async def run_daily_cleanup(period):
+    """
+    Deletes the availability of the day before `period` (a date), once across all processes.
+    """
+    # Calculate yesterday's index
+    yesterday_index = (datetime.date.fromisoformat(period).weekday() - 1) % 7
+    days = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+    async def work(run):
+        with track_task("daily_cleanup"):
+            await run_write(_delete_day_availability, yesterday_index)
+            await run_write(_prune_changes, time.time() - CHANGE_LOG_RETENTION_SECONDS)
+
+    # Availability is global: one lease for every process, whatever its shards
+    if await run_job("daily_cleanup", period, work):
+        common_availability_cache.clear()
+        print(f"Database cleaned for {days[yesterday_index]}.")
+
 @tasks.loop(time=datetime.time(hour=12, minute=0))
 async def weekly_schedule():
     """
@@ -71,15 +185,36 @@ async def weekly_schedule():
         print("Error: Bot not attached to weekly_schedule.")
         return
         
-    bot = weekly_schedule.bot
-    cursor = conn.cursor()
+    await run_weekly_schedule(weekly_schedule.bot, _week_period())
 
-    # 1. Get all Guild Configurations
-    cursor.execute("SELECT guild_id, planning_channel_id, default_channel_id FROM guild_configs")
-    guilds = cursor.fetchall()
-    
-    for guild_id, planning_chan_id, default_chan_id in guilds:
-        target_channel_id = planning_chan_id if planning_chan_id else default_chan_id
+async def run_weekly_schedule(bot, period):
+    """
+    Posts the weekly schedules of `period` (an ISO week) if this process is the job leader.
+    """
+    async def work(run):
+        with track_task("weekly_schedule"):
+            await post_weekly_schedules(bot, run)
+
+    if not await run_job(_job_name(bot, "weekly_schedule"), period, work):
+        print(f"Weekly schedule {period}: run by another process or already done.")
+
+async def post_weekly_schedules(bot, run=None):
+    """
+    Computes and posts the weekly schedule of every team in every configured guild
+    of the shards owned by this process.
+
+    Args:
+        bot: The Discord bot instance.
+        run: Optional JobRun: recaps already posted are skipped, new ones recorded.
+    """
+    # 1. Get all Guild Configurations (cached), keep those with a reachable channel
+    channels = {}
+    for config in all_guild_configs():
+        guild_id = config["guild_id"]
+        if not owns_guild(bot, guild_id):
+            continue # Posted by the process owning this guild's shard
+
+        target_channel_id = config["planning_channel_id"] or config["default_channel_id"]
         
         if not target_channel_id:
             continue # No channel configured for this guild
@@ -88,38 +223,29 @@ async def weekly_schedule():
         if not channel:
             print(f"Channel {target_channel_id} not found for guild {guild_id}.")
             continue
-            
-        # 2. Get teams for this guild
-        cursor.execute("SELECT DISTINCT team FROM players WHERE guild_id = ?", (guild_id,))
-        teams = [row[0] for row in cursor.fetchall()]
-        
-        for team in teams:
-            schedule = calculate_common_availability(team, guild_id, conn)
-            if not schedule:
-                continue
-                
-            embed = discord.Embed(
-                title=f"📅 Emploi du temps - Équipe {team.title()}",
-                description="Voici les créneaux communs pour la semaine :",
-                color=discord.Color.green()
-            )
-            days_str = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
-            
-            has_slots = False
-            for day_idx, slots in schedule.items():
-                if slots:
-                    has_slots = True
-                    slots_str = "\n".join([f"• {s[0]}h - {s[1]}h" for s in slots])
-                    embed.add_field(name=days_str[day_idx], value=slots_str, inline=False)
-            
-            if not has_slots:
-                embed.description = "Pas de créneaux communs trouvés pour cette semaine."
-                embed.color = discord.Color.orange()
-                
-            try:
-                await channel.send(embed=embed)
-            except Exception as e:
-                print(f"Error sending schedule for {team} in guild {guild_id}: {e}")
+        channels[guild_id] = channel
+
+    # 2. Compute every team of these guilds at once
+    schedules, stats = await run_read(compute_all_schedules, set(channels))
+    print(f"Weekly schedule computed: {stats['teams']} teams, {stats['players']} players in {stats['seconds'] * 1000:.0f} ms.")
+
+    # 3. Post: one queue per channel, several channels at once, retries, one summary
+    jobs = [
+        (channels[guild_id], f"{team} (guild {guild_id})", {"embed": _schedule_embed(team, schedule)})
+        for guild_id, team_schedules in schedules.items()
+        for team, schedule in team_schedules
+    ]
+    on_sent = keep_going = None
+    if run is not None:
+        jobs = run.pending(jobs, key=lambda job: job[1])
+        on_sent = run.mark_done
+        # The new leader resumes the run: stop posting once the lease is lost
+        keep_going = lambda: not run.lost
+    progress = FanoutProgress("Weekly schedule posts", len(jobs))
+    await post_by_channel(jobs, SCHEDULE_POST_CONCURRENCY,
+                          limiter=RateLimiter(SCHEDULE_POST_RATE_PER_SECOND), progress=progress,
+                          on_sent=on_sent, keep_going=keep_going)
+    print(progress.summary())
 
 @tasks.loop(time=datetime.time(hour=18, minute=0))
 async def availability_reminder():
@@ -137,22 +263,124 @@ async def availability_reminder():
         print("Error: Bot not attached to availability_reminder.")
         return
     
-    bot = availability_reminder.bot
-    
-    cursor = conn.cursor()
-    # Get all DISTINCT players (users might be in multiple guilds)
-    cursor.execute("SELECT DISTINCT discord_id, username FROM players")
-    all_players = cursor.fetchall()
-    
-    for pid, username in all_players:
-        # Check if they have availability for next week
-        cursor.execute("SELECT 1 FROM availability WHERE discord_id = ?", (pid,))
-        if cursor.fetchone() is None:
-            # User has no availability set
-            try:
-                user = await bot.fetch_user(pid)
-                if user:
-                    await user.send(f"Salut {username} ! 👋\nCeci est un rappel : pense à remplir tes disponibilités pour la semaine à venir via la commande `/ajout_dispo` !")
-                    print(f"Reminder sent to {username}.")
-            except Exception as e:
-                print(f"Could not send reminder to {username}: {e}")
+    await run_availability_reminder(availability_reminder.bot, _week_period())
+
+async def run_availability_reminder(bot, period):
+    """
+    Sends the reminders of `period` (an ISO week) if this process is the job leader.
+    """
+    async def work(run):
+        with track_task("availability_reminder"):
+            await send_availability_reminders(bot, run)
+
+    if not await run_job(_job_name(bot, "availability_reminder"), period, work):
+        print(f"Availability reminder {period}: run by another process or already done.")
+
+async def send_availability_reminders(bot, run=None):
+    """
+    Sends a DM to every player who has no availability at all
+    (those whose lowest guild belongs to the shards owned by this process).
+
+    Args:
+        bot: The Discord bot instance.
+        run: Optional JobRun: players already reminded are skipped, new ones recorded.
+    """
+    players_to_remind = [
+        player for player in await run_read(_fetch_players_without_availability)
+        if owns_guild(bot, player[2])
+    ]
+    if run is not None:
+        players_to_remind = run.pending(players_to_remind, key=lambda player: player[0])
+    progress = FanoutProgress("Availability reminders", len(players_to_remind))
+
+    async def send_reminder(player):
+        pid, username, _ = player
+        # Cached user and DM channel first: no REST call to resolve the user
+        user = bot.get_user(pid)
+        channel = user.dm_channel if user else None
+        if channel is None:
+            channel = await bot.create_dm(user or discord.Object(id=pid))
+        message = f"Salut {username} ! 👋\nCeci est un rappel : pense à remplir tes disponibilités pour la semaine à venir via la commande `/ajout_dispo` !"
+        await send_with_retry(lambda: channel.send(message))
+        if run is not None:
+            run.mark_done(pid)
+
+    items = run.while_held(players_to_remind) if run is not None else players_to_remind
+    await fan_out(items, send_reminder, REMINDER_CONCURRENCY,
+                  limiter=RateLimiter(REMINDER_RATE_PER_SECOND), progress=progress)
+    print(progress.summary())
+
+@tasks.loop(seconds=LEASE_SECONDS)
+async def resume_jobs():
+    """
+    Hot standby: resumes this period's job runs left unfinished by a process that
+    stopped mid-run (their lease expired), skipping what was already done.
+    """
+    bot = resume_jobs.bot
+    try:
+        await resume_unfinished_jobs({
+            "daily_cleanup": (_day_period(), run_daily_cleanup),
+            _job_name(bot, "weekly_schedule"): (_week_period(), functools.partial(run_weekly_schedule, bot)),
+            _job_name(bot, "availability_reminder"): (_week_period(), functools.partial(run_availability_reminder, bot)),
+        })
+    except Exception as e:
+        print(f"Error in resume_jobs: {e}")
+
+async def init_external_writes_position():
+    """
+    Starts following the change log from its current end. Call before loading the
+    in-memory state (guild configs, reminders) so no change falls in between;
+    later calls (reconnects) keep the current position.
+    """
+    if getattr(external_writes_watch, 'last_id', None) is None:
+        external_writes_watch.last_id = await run_read(_last_change_id)
+
+async def apply_external_changes(bot):
+    """
+    Applies the change log entries written by other processes since the last call:
+    only the member, team, guild config or session that changed is updated.
+    Entries of guilds owned by other processes are skipped.
+    """
+    last_id = external_writes_watch.last_id
+    configs, sessions = set(), set()
+    while True:
+        changes = await run_read(_fetch_changes, last_id, CHANGE_LOG_BATCH)
+        for change_id, origin, kind, guild_id, key in changes:
+            last_id = change_id
+            if origin == OWNER:
+                continue # Applied when written
+            if guild_id is not None and not owns_guild(bot, guild_id):
+                continue
+            if kind == CHANGE_MEMBER:
+                common_availability_cache.invalidate_member(key, guild_id)
+            elif kind == CHANGE_TEAM:
+                common_availability_cache.invalidate_key((guild_id, key))
+            elif kind == CHANGE_AVAILABILITY:
+                common_availability_cache.clear()
+            elif kind == CHANGE_CONFIG:
+                configs.add(guild_id)
+            elif kind == CHANGE_SESSION:
+                sessions.add(key)
+        if len(changes) < CHANGE_LOG_BATCH:
+            break
+
+    # Once per guild / session, however many times it changed
+    for guild_id in configs:
+        await reload_guild_config(guild_id)
+    for session_id in sessions:
+        await session_reminders.refresh(session_id)
+    external_writes_watch.last_id = last_id
+
+@tasks.loop(seconds=EXTERNAL_WRITES_POLL_SECONDS)
+async def external_writes_watch():
+    """
+    Follows the change log of other processes (other shards, standby): invalidates
+    the cached availabilities of the changed members/teams, reloads changed guild
+    configurations and refreshes changed sessions in the reminder scheduler.
+    """
+    if getattr(external_writes_watch, 'last_id', None) is None:
+        await init_external_writes_position()
+    try:
+        await apply_external_changes(external_writes_watch.bot)
+    except Exception as e:
+        print(f"Error in external_writes_watch: {e}")
@@ -1,4 +1,4 @@
-from modules.database import conn
+from modules.config import get_guild_config
 
 async def has_permission(interaction):
     """
@@ -15,12 +15,11 @@ async def has_permission(interaction):
     if not interaction.guild_id:
         return False # DM or no guild
         
-    cursor = conn.cursor()
-    cursor.execute("SELECT admin_role_id FROM guild_configs WHERE guild_id = ?", (interaction.guild_id,))
-    result = cursor.fetchone()
+    # In-memory lookup (guild config cache)
+    config = get_guild_config(interaction.guild_id)
     
-    if result and result[0]:
-        role_id = result[0]
+    if config and config["admin_role_id"]:
+        role_id = config["admin_role_id"]
         user_roles = [r.id for r in interaction.user.roles]
         if role_id in user_roles:
             return True
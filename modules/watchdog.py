@@ -0,0 +1,146 @@
+#------------------------------------------------------
+#           Imports
+#------------------------------------------------------
+import asyncio
+import collections
+import datetime
+import json
+import sys
+import threading
+import time
+import traceback
+
+from modules.metrics import LOOP_LAG, LOOP_STALLS
+
+#------------------------------------------------------
+#           Configuration
+#------------------------------------------------------
+# Heartbeat period upper bound (seconds); lower when the threshold is small
+HEARTBEAT_INTERVAL = 0.1
+# Innermost frames kept per captured stack
+STACK_DEPTH = 25
+# Stall records kept in memory (see recent_stalls)
+RECENT_STALLS = 50
+
+#------------------------------------------------------
+#           Watchdog
+#------------------------------------------------------
+class LoopWatchdog:
+    """
+    Measures event loop scheduling delay and captures what blocks it.
+
+    A heartbeat coroutine sleeps for `interval` and records how late it woke up
+    (zeri_event_loop_lag_seconds). A monitor thread checks the last heartbeat: once
+    the loop is stalled for longer than `threshold`, it grabs the stack of the loop
+    thread while the blocking call is still running. When the loop comes back, the
+    stall is emitted as one JSON record (printed, or appended to `log_path`).
+    """
+
+    def __init__(self, threshold, log_path=None):
+        self.threshold = threshold
+        self.interval = min(HEARTBEAT_INTERVAL, threshold / 2)
+        self.log_path = log_path
+        self.recent = collections.deque(maxlen=RECENT_STALLS)
+        self._lock = threading.Lock()
+        self._loop_thread_id = None
+        self._last_beat = None
+        self._beats = 0
+        self._sample = None     # (beat number, seconds since last beat, stack)
+        self._task = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Starts the heartbeat and the monitor thread (must run on the event loop).
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._monitor, name="zeri-loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self._beat(max(0.0, time.monotonic() - expected))
+
+    def _beat(self, lag):
+        LOOP_LAG.observe(lag)
+        with self._lock:
+            self._beats += 1
+            self._last_beat = time.monotonic()
+            sample, self._sample = self._sample, None
+        if lag >= self.threshold:
+            LOOP_STALLS.inc()
+            self._emit(lag, sample)
+
+    def _monitor(self):
+        poll = max(0.005, self.threshold / 4)
+        while not self._stopped.wait(poll):
+            with self._lock:
+                stalled = time.monotonic() - self._last_beat - self.interval
+                if stalled < self.threshold or (self._sample and self._sample[0] == self._beats):
+                    continue
+                beat = self._beats
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.extract_stack(frame)[-STACK_DEPTH:] if frame is not None else []
+            with self._lock:
+                # Only keep it if the loop did not move on meanwhile
+                if self._beats == beat:
+                    self._sample = (beat, stalled, stack)
+
+    def _emit(self, lag, sample):
+        record = {
+            "event": "event_loop_stall",
+            "time": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "lag_ms": round(lag * 1000, 1),
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "sampled_after_ms": round(sample[1] * 1000, 1) if sample else None,
+            # Innermost frame last, like a traceback
+            "stack": [
+                {"file": f.filename, "line": f.lineno, "function": f.name, "code": f.line}
+                for f in (sample[2] if sample else [])
+            ],
+        }
+        self.recent.append(record)
+        line = json.dumps(record, ensure_ascii=False)
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"Watchdog log error: {e}")
+        else:
+            print(line)
+
+_watchdog = None
+
+def start_watchdog(threshold_ms, log_path=None):
+    """
+    Starts the event loop watchdog once per process (call from the running loop).
+
+    Args:
+        threshold_ms: Lag (ms) above which a stall is recorded with its stack (> 0).
+        log_path: Optional JSON lines file; records are printed otherwise.
+    """
+    global _watchdog
+    if _watchdog is not None:
+        return _watchdog
+    if not threshold_ms > 0:
+        # 0 would make the heartbeat a busy loop, negative values flag every beat
+        raise ValueError(f"watchdog threshold must be positive, got {threshold_ms} ms")
+    _watchdog = LoopWatchdog(threshold_ms / 1000, log_path)
+    _watchdog.start()
+    print(f"Event loop watchdog enabled (threshold {threshold_ms} ms).")
+    return _watchdog
+
+def recent_stalls():
+    """
+    Returns the last recorded stalls (most recent last).
+    """
+    return list(_watchdog.recent) if _watchdog else []
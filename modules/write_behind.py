@@ -0,0 +1,158 @@
+#------------------------------------------------------
+#           Imports
+#------------------------------------------------------
+import asyncio
+
+from modules.database import run_write, run_write_blocking, transaction
+
+#------------------------------------------------------
+#           Configuration
+#------------------------------------------------------
+# Group commit window: writes arriving within it share one transaction
+FLUSH_INTERVAL = 0.05
+# A batch is flushed as soon as it reaches this size
+BATCH_SIZE = 200
+
+#------------------------------------------------------
+#           Batch Apply
+#------------------------------------------------------
+def _apply_batch(mutations, conn):
+    """
+    Applies queued mutations in one transaction and one commit (runs on the writer thread).
+    Each mutation runs in its own savepoint: a failing one is rolled back alone.
+
+    Args:
+        mutations: List of (func, args); func(*args, conn) must not commit.
+
+    Returns:
+        list: (True, result) or (False, exception) per mutation.
+    """
+    results = []
+    with transaction(conn):
+        for func, args in mutations:
+            try:
+                # Nested unit of work: a savepoint per mutation
+                with transaction(conn):
+                    value = func(*args, conn)
+            except Exception as e:
+                results.append((False, e))
+                continue
+            results.append((True, value))
+    return results
+
+#------------------------------------------------------
+#           Queue
+#------------------------------------------------------
+class _Mutation:
+    __slots__ = ("key", "func", "args", "on_commit", "future")
+
+    def __init__(self, key, func, args, on_commit, future):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.on_commit = on_commit
+        self.future = future
+
+class WriteBehindQueue:
+    """
+    Write-behind queue for command handlers: mutations are acknowledged right away
+    and applied later in batches, one transaction (and one commit) per batch.
+
+    Mutations are keyed by user: `await flushed(key)` before reading that user's
+    data gives read-your-writes. Order is kept (one flusher, one writer thread).
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = []
+        self._by_key = {}       # key -> set of pending futures
+        self._full = None       # asyncio.Event, created on the running loop
+        self._task = None
+
+    def submit(self, key, func, *args, on_commit=None):
+        """
+        Queues func(*args, conn) and returns a future resolved after its batch is committed.
+        Awaiting it is optional; on_commit(result) runs once the write is durable.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Failures are logged by the flusher; nobody has to retrieve them
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._queue.append(_Mutation(key, func, args, on_commit, future))
+        self._by_key.setdefault(key, set()).add(future)
+
+        if self._full is None:
+            self._full = asyncio.Event()
+        if len(self._queue) >= self.batch_size:
+            self._full.set()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._flusher())
+        return future
+
+    async def flushed(self, key):
+        """
+        Waits until every pending write of `key` is committed.
+        """
+        pending = self._by_key.get(key)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @property
+    def pending(self):
+        return len(self._queue)
+
+    async def _flusher(self):
+        while self._queue:
+            if len(self._queue) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            if not self._queue:
+                # Drained meanwhile by flush_blocking() (shutdown)
+                break
+            batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+            try:
+                results = await run_write(_apply_batch, [(m.func, m.args) for m in batch])
+            except Exception as e:
+                print(f"Error in write-behind flush ({len(batch)} writes): {e}")
+                results = [(False, e)] * len(batch)
+            for mutation, (ok, value) in zip(batch, results):
+                self._complete(mutation, ok, value)
+
+    def _complete(self, mutation, ok, value):
+        if ok and mutation.on_commit is not None:
+            try:
+                mutation.on_commit(value)
+            except Exception as e:
+                print(f"Error in write-behind callback ({mutation.func.__name__}): {e}")
+        if not ok:
+            print(f"Error in write-behind ({mutation.func.__name__}): {value}")
+        if not mutation.future.done():
+            if ok:
+                mutation.future.set_result(value)
+            else:
+                mutation.future.set_exception(value)
+        pending = self._by_key.get(mutation.key)
+        if pending is not None:
+            pending.discard(mutation.future)
+            if not pending:
+                del self._by_key[mutation.key]
+
+    def flush_blocking(self):
+        """
+        Applies every queued write without the event loop (shutdown, from main.py).
+        Returns the number of writes applied.
+        """
+        batch, self._queue = self._queue, []
+        if not batch:
+            return 0
+        results = run_write_blocking(_apply_batch, [(m.func, m.args) for m in batch])
+        for mutation, (ok, value) in zip(batch, results):
+            if not ok:
+                print(f"Error in write-behind ({mutation.func.__name__}): {value}")
+        return len(batch)
+
+write_queue = WriteBehindQueue()